@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from bmi_calculator import BMICalculator
 from diabetes_dataset import DiabetesDataset
+from reference_store import ReferenceStore
 
 # page configuration
 st.set_page_config(
@@ -33,12 +34,23 @@ page = st.sidebar.selectbox(
 # load data
 
 # streamlit cache to optimize data loading
+# (cache_resource keeps one shared dataset object, so a lazy load that
+# happens on one page is reused by every later rerun)
 
 
-@st.cache_data
+@st.cache_resource
 # function to load data
 def load_data():
-    return DiabetesDataset("./data/processed/diabetes_cleaned.csv")
+    # lazy: the Home page counts come from the file header and a line
+    # count, the full table is only parsed when a page needs the values
+    return DiabetesDataset("./data/processed/diabetes_cleaned.csv", lazy=True)
+
+
+@st.cache_resource
+# one store per server; it swaps in newly published reference snapshots
+# without a restart (python reference_store.py --build publishes one)
+def load_reference_store():
+    return ReferenceStore()
 
 
 try:
@@ -69,6 +81,21 @@ try:
         st.subheader("Statistical Summary")
         st.dataframe(df.get_summary(), use_container_width=True)
 
+        # Missing values per column (comes from the cached quality check)
+        st.subheader("Missing Values")
+        missing = df.get_missing_counts()
+        st.dataframe(
+            pd.DataFrame({
+                "Missing": missing,
+                "Missing %": (missing / df.get_record_count() * 100).round(1),
+            }),
+            use_container_width=True)
+
+        # Which measurements are missing together (True = missing)
+        st.subheader("Missing Patterns")
+        st.caption(f"{df.get_complete_count()} complete records")
+        st.dataframe(df.get_missing_patterns(), use_container_width=True)
+
     elif page == "BMI Calculator":
         st.header("🧮 BMI Calculator")
 
@@ -98,9 +125,25 @@ try:
                 else:
                     st.error(f"Category: {category}")
 
-    elif page == "Analysis & Insights":
-        st.header("📈 Analysis & Insights")
-        st.write("Coming soon: Advanced visualizations and statistical analysis")
+    elif page == "Statistical Analysis & Insights":
+        st.header("📈 Statistical Analysis & Insights")
+
+        # one snapshot for the whole rerun, so every table shows the same
+        # reference version even if a new one is published meanwhile
+        try:
+            reference = load_reference_store().current()
+        except FileNotFoundError:
+            # no snapshot and no built index; not the data file's fault
+            reference = None
+            st.error("Reference data not found. Please build it with "
+                     "'python reference_store.py --build'.")
+
+        if reference is not None:
+            st.caption(f"Reference data version: {reference.version}")
+
+            st.subheader("Healthy vs Diabetic Reference Values")
+            st.dataframe(pd.DataFrame(reference.index.summary).T,
+                         use_container_width=True)
 
 except FileNotFoundError:
     st.error("Data file not found. Please ensure 'diabetes_cleaned.csv' is in the data/processed/ folder.")
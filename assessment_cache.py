@@ -0,0 +1,158 @@
+# Memoizing cache in front of RiskAssessor.assess.
+#
+# The same inputs come back again and again: a patient re-submitted, or
+# the round numbers the Streamlit form starts with. AssessmentCache keys
+# each profile on its HealthProfile.to_dict(), with every value rounded to
+# the precision the dataset records it at, so near-identical inputs share
+# an entry and a repeat request is one dictionary lookup.
+#
+# A miss assesses the rounded profile itself, not the original, so a
+# result never depends on which of the near-identical inputs came first.
+# Entries are dropped least recently used first beyond max_entries, and
+# after ttl seconds.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from health_profile import HealthProfile
+from risk_assessor import RiskAssessment, RiskAssessor, check_profile
+
+
+DEFAULT_MAX_ENTRIES = 4096
+
+# Seconds an entry stays valid (None keeps it until evicted)
+DEFAULT_TTL = 600.0
+
+# Decimal places kept for each HealthProfile field: the precision of the
+# diabetes dataset's columns
+QUANTIZE_DECIMALS = {
+    'pregnancies': 0,
+    'glucose': 0,
+    'blood_pressure': 0,
+    'skin_thickness': 0,
+    'insulin': 0,
+    'bmi': 1,
+    'diabetes_pedigree': 3,
+    'age': 0,
+}
+
+
+def profile_key(profile: HealthProfile) -> Tuple[Tuple[str, float], ...]:
+    """
+    Canonical cache key of a profile: its to_dict() items, sorted by
+    field, with values rounded to QUANTIZE_DECIMALS. NaN measurements are
+    left out, as assessment treats them as missing (and NaN never equals
+    itself, so it would never match a stored key).
+    """
+    return tuple(sorted(
+        (field, round(float(value), QUANTIZE_DECIMALS.get(field, 3)))
+        for field, value in profile.to_dict().items()
+        if value == value
+    ))
+
+
+class AssessmentCache:
+    """
+    LRU cache with expiry for risk assessments.
+
+    Example:
+        cache = AssessmentCache(RiskAssessor(), max_entries=10_000, ttl=300)
+        assessment = cache.assess(profile)    # assessed and stored
+        assessment = cache.assess(profile)    # dictionary lookup
+        cache.stats()                         # {'hits': 1, 'misses': 1, ...}
+
+    Safe to share between threads. Two threads missing on the same key
+    at once both assess it; the results are identical.
+    """
+
+    def __init__(self, assessor: Optional[RiskAssessor] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl: Optional[float] = DEFAULT_TTL):
+        """
+        Args:
+            assessor: Assessor used on a miss (default: RiskAssessor())
+            max_entries: Entries kept before the least recently used are
+                evicted
+            ttl: Seconds before an entry expires, or None for no expiry
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.assessor = assessor if assessor is not None else RiskAssessor()
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._lock = threading.Lock()
+        # key -> (expiry time, assessment), least recently used first
+        self._entries: 'OrderedDict[tuple, Tuple[float, RiskAssessment]]' = (
+            OrderedDict())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def assess(self, profile: HealthProfile) -> RiskAssessment:
+        """
+        RiskAssessor.assess of the profile's rounded values, from the
+        cache when possible.
+
+        Raises:
+            ValueError: If the profile fails validation (never cached)
+        """
+        check_profile(profile)
+
+        # Rounding to the precision of VALID_RANGES keeps a valid profile
+        # valid
+        key = profile_key(profile)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, assessment = entry
+                if now < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return assessment
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Assess outside the lock so other lookups aren't held up
+        assessment = self.assessor.assess(HealthProfile.from_dict(dict(key)))
+
+        expires = now + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            self._entries[key] = (expires, assessment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return assessment
+
+    def clear(self) -> None:
+        """Drop every entry (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Counters and current size."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hit_rate,
+            }
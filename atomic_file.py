@@ -0,0 +1,43 @@
+# Atomic file replacement.
+#
+# Every output in the project (cleaned data, sidecar caches, reference
+# files, snapshots) is written to a temporary file in the same folder and
+# renamed over the target, so a reader sees the old file or the new one,
+# never a half-written one. Each write gets its own uniquely named
+# temporary file (tempfile.mkstemp), so threads of one process - such as
+# Streamlit sessions sharing a cached DiabetesDataset - can write the same
+# target at once; the last rename wins.
+
+import os
+import tempfile
+from typing import Callable
+
+
+# mkstemp creates files readable by the owner only; outputs get the
+# permissions a plain open() would give them. Read once, at import, since
+# os.umask can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_atomic(path: str, write: Callable[[str], None]) -> None:
+    """
+    Replace path with a file written by write(tmp_path).
+
+    The temporary file is removed if write or the rename fails, and the
+    error is re-raised.
+
+    Example:
+        write_atomic('out.json', lambda tmp: json.dump(data, open(tmp, 'w')))
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'{name}.', suffix='.tmp',
+                                    dir=directory or '.')
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,81 @@
+# Benchmark the chunked cleaning pipeline in data_cleaning.py.
+#
+# Builds copies of the raw sample file at several multiples of its size
+# and reports rows/second for the Phase 2 notebook's approach (whole file
+# in memory, one replace() per column) and for data_cleaning.clean_file
+# writing CSV and Feather.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_cleaning
+#     python -m benchmarks.bench_cleaning --scales 1 100 --chunksize 50000
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.scaled_data import make_scaled_copy
+from data_cleaning import (DEFAULT_CHUNK_ROWS, RAW_PATH,
+                           ZERO_AS_MISSING_COLUMNS, clean_file)
+
+DEFAULT_SCALES = [1, 100, 1_000]
+
+
+def notebook_clean(raw_path, output_path):
+    # The Phase 2 notebook: load everything, replace column by column
+    df = pd.read_csv(raw_path)
+    df_clean = df.copy()
+    for col in ZERO_AS_MISSING_COLUMNS:
+        df_clean[col] = df_clean[col].replace(0, np.nan)
+    df_clean.to_csv(output_path, index=False)
+    return len(df_clean)
+
+
+def best_rate(run, repeats):
+    # Best rows/second over several runs
+    best = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = run()
+        best = max(best, rows / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure cleaning throughput in rows/second')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='multiples of the raw sample file to test')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scale':>8} {'rows':>12} {'notebook/s':>14} "
+          f"{'chunked csv/s':>14} {'chunked feather/s':>18}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            raw_path = make_scaled_copy(RAW_PATH, scale, directory)
+            out_csv = os.path.join(directory, 'cleaned.csv')
+            out_feather = os.path.join(directory, 'cleaned.feather')
+            notebook = best_rate(
+                lambda: notebook_clean(raw_path, out_csv), args.repeats)
+            chunked_csv = best_rate(
+                lambda: clean_file(raw_path, out_csv, args.chunksize).rows,
+                args.repeats)
+            chunked_feather = best_rate(
+                lambda: clean_file(raw_path, out_feather, args.chunksize,
+                                   'feather').rows,
+                args.repeats)
+            rows = clean_file(raw_path, out_csv, args.chunksize).rows
+            os.remove(raw_path)
+
+            print(f"{scale:>8} {rows:>12,} {notebook:>14,.0f} "
+                  f"{chunked_csv:>14,.0f} {chunked_feather:>18,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Benchmark DiabetesDataset's pandas and pyarrow CSV engines.
+#
+# Builds copies of the cleaned sample file at several multiples of its
+# size and times a full, uncached load with each engine.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_csv_engines
+#     python -m benchmarks.bench_csv_engines --scales 1 100
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.scaled_data import make_scaled_copy
+from diabetes_dataset import ENGINES, DiabetesDataset
+
+SAMPLE_PATH = './data/processed/diabetes_cleaned.csv'
+DEFAULT_SCALES = [1, 100, 10_000]
+
+
+def time_load(path, engine, repeats):
+    # Best of several uncached loads, in seconds
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        dataset = DiabetesDataset(path, use_cache=False, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best, dataset.get_record_count()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare DiabetesDataset CSV engines')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='multiples of the sample file to test')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scale':>8} {'rows':>12} {'MB':>8} "
+          + ' '.join(f'{engine + " s":>12}' for engine in ENGINES)
+          + f" {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            path = make_scaled_copy(SAMPLE_PATH, scale, directory)
+            size_mb = os.path.getsize(path) / 1e6
+            times = {}
+            for engine in ENGINES:
+                times[engine], rows = time_load(path, engine, args.repeats)
+            os.remove(path)
+
+            print(f"{scale:>8} {rows:>12,} {size_mb:>8.1f} "
+                  + ' '.join(f'{times[engine]:>12.4f}' for engine in ENGINES)
+                  + f" {times['pandas'] / times['pyarrow']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Benchmark the imputers in imputation.py on large synthetic data.
+#
+# Builds a synthetic dataset by resampling rows of the cleaned sample
+# (keeping its missing-value patterns) and adding noise to the features,
+# then times fitting and chunked application of each imputer and records
+# peak traced memory.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_imputation
+#     python -m benchmarks.bench_imputation --rows 2000000 --chunksize 250000
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from imputation import KNNImputer, MedianImputer, impute_chunks
+
+SAMPLE_PATH = './data/processed/diabetes_cleaned.csv'
+DEFAULT_ROWS = 1_000_000
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Features that get Gaussian noise of this fraction of their standard
+# deviation, so resampled rows spread out instead of stacking up on the
+# sample's 768 points (which is unrealistic and slows any neighbour search)
+JITTER_COLUMNS = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
+                  'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age']
+JITTER_SCALE = 0.1
+
+
+def make_synthetic(rows, seed=0):
+    # Resample the sample's rows with replacement and add noise
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(SAMPLE_PATH)
+    df = sample.iloc[rng.integers(len(sample), size=rows)].reset_index(drop=True)
+    for column in JITTER_COLUMNS:
+        noise = rng.normal(0, JITTER_SCALE * sample[column].std(), size=rows)
+        df[column] = (df[column] + noise).clip(lower=0)
+    return df
+
+
+def chunks_of(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def measure(func):
+    # (result, seconds, peak traced MB) of func()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure imputation throughput and memory')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_synthetic(args.rows)
+    missing = df[['Insulin', 'SkinThickness']].isnull().sum()
+    print(f"{args.rows:,} synthetic rows, {df.memory_usage().sum() / 1e6:.0f} MB; "
+          f"missing Insulin {missing['Insulin']:,}, "
+          f"SkinThickness {missing['SkinThickness']:,}")
+
+    def apply(imputer):
+        # Drain the chunked imputation, keeping only a checksum
+        total = 0.0
+        for chunk in impute_chunks(chunks_of(df, args.chunksize), imputer):
+            total += chunk['Insulin'].sum()
+        return total
+
+    print(f"{'method':>8} {'fit s':>8} {'fit MB':>8} {'apply s':>8} "
+          f"{'rows/s':>12} {'apply MB':>9}")
+    fitters = {
+        'median': lambda: MedianImputer.from_frame(df),
+        'knn': lambda: KNNImputer(k=args.k).fit(
+            chunks_of(df, args.chunksize)),
+    }
+    for method, fit in fitters.items():
+        imputer, fit_seconds, fit_mb = measure(fit)
+        _, apply_seconds, apply_mb = measure(lambda: apply(imputer))
+        print(f"{method:>8} {fit_seconds:>8.2f} {fit_mb:>8.0f} "
+              f"{apply_seconds:>8.2f} {args.rows / apply_seconds:>12,.0f} "
+              f"{apply_mb:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Benchmark batch risk assessment in risk_assessor.py.
+#
+# Resamples the cleaned sample's rows into a large columnar batch of
+# profiles (HealthProfile field names, missing optional measurements kept
+# as NaN) and reports profiles/second for RiskAssessor.assess_batch, with
+# one-at-a-time assess() on a small slice for comparison.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_risk
+#     python -m benchmarks.bench_risk --rows 5000000
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from health_profile import FEATURE_COLUMNS, HealthProfile
+from risk_assessor import RiskAssessor
+
+SAMPLE_PATH = './data/processed/diabetes_cleaned.csv'
+DEFAULT_ROWS = 1_000_000
+SINGLE_ROWS = 10_000
+
+
+def make_batch(rows, seed=0):
+    # Columns of resampled profiles, keyed by HealthProfile field
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(SAMPLE_PATH).dropna(
+        subset=['Glucose', 'BloodPressure', 'BMI', 'Age'])
+    picks = rng.integers(len(sample), size=rows)
+    return {field: sample[column].to_numpy(dtype='float64')[picks]
+            for field, column in FEATURE_COLUMNS.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure batch and single-profile risk assessment')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    assessor = RiskAssessor()
+    batch = make_batch(args.rows)
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = assessor.assess_batch(batch)
+        best = min(best, time.perf_counter() - start)
+    print(f"batch:  {args.rows:,} profiles in {best:.3f}s, "
+          f"{args.rows / best:,.0f} profiles/s "
+          f"({int(result.valid.sum()):,} valid)")
+
+    profiles = [
+        HealthProfile.from_dict({field: float(values[i])
+                                 for field, values in batch.items()
+                                 if not np.isnan(values[i])})
+        for i in range(min(SINGLE_ROWS, args.rows))
+    ]
+    start = time.perf_counter()
+    for profile in profiles:
+        if profile.is_valid():
+            assessor.assess(profile)
+    seconds = time.perf_counter() - start
+    print(f"single: {len(profiles):,} profiles in {seconds:.3f}s, "
+          f"{len(profiles) / seconds:,.0f} profiles/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+# Scaled-up copies of the sample CSV files for the benchmarks.
+#
+# Used by bench_csv_engines.py and bench_cleaning.py; not a benchmark
+# itself.
+
+import os
+
+
+def make_scaled_copy(source_path, scale, directory):
+    # Repeat source_path's data lines scale times under a single header,
+    # as <name>_x<scale>.csv in directory
+    with open(source_path, 'rb') as f:
+        header = f.readline()
+        body = f.read()
+    if not body.endswith(b'\n'):
+        body += b'\n'
+
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    path = os.path.join(directory, f'{name}_x{scale}.csv')
+    with open(path, 'wb') as f:
+        f.write(header)
+        for _ in range(scale):
+            f.write(body)
+    return path
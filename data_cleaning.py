@@ -0,0 +1,571 @@
+# Cleaning pipeline: data/raw/diabetes.csv -> data/processed/diabetes_cleaned.csv
+#
+# This is the Phase 2 notebook's cleaning step as an importable module.
+# In the raw data a 0 in Glucose, BloodPressure, SkinThickness, Insulin or
+# BMI means "not measured", so those zeros become NaN; values outside
+# health_profile.VALID_RANGES and non-numeric text become NaN too. The
+# rules are declared as data and compiled into one pass per column. The
+# raw file is read in chunks and the cleaned rows are streamed straight
+# to the output, so the whole dataset is never held in memory.
+#
+# Usage:
+#     python data_cleaning.py
+#     python data_cleaning.py raw.csv cleaned.feather --format feather
+#     python data_cleaning.py --incremental
+
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from atomic_file import write_atomic
+from health_profile import FEATURE_COLUMNS, VALID_RANGES
+
+
+RAW_PATH = './data/raw/diabetes.csv'
+CLEANED_PATH = './data/processed/diabetes_cleaned.csv'
+
+# Columns where 0 is physically impossible and really means missing
+ZERO_AS_MISSING_COLUMNS = [
+    'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
+
+# Columns that hold whole numbers (written as "6", not "6.0")
+INTEGER_COLUMNS = ['Pregnancies', 'Age', 'Outcome']
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+OUTPUT_FORMATS = ('csv', 'feather')
+
+
+@dataclass
+class CleaningReport:
+    """
+    What a cleaning run did.
+
+    Attributes:
+        rows: Records processed
+        hits: Values each rule turned into missing, keyed by rule name
+            (e.g. 'Glucose.zero_as_missing')
+        seconds: Wall-clock time for the run
+        chunks: Raw chunks in the output (incremental rebuilds only)
+        chunks_reused: Of those, chunks taken from the store uncleaned
+    """
+
+    rows: int = 0
+    hits: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+    chunks: int = 0
+    chunks_reused: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+
+# ============================================================
+# RULES
+# ============================================================
+
+# 'numeric': text that isn't a number becomes missing
+# 'integer': values that aren't whole numbers become missing, and the
+#            column is always nullable Int64
+# 'zero_as_missing': 0 means "not measured"
+# 'range': values outside [low, high] become missing
+RULE_KINDS = ('numeric', 'integer', 'zero_as_missing', 'range')
+
+
+@dataclass(frozen=True)
+class CleaningRule:
+    """
+    One declarative cleaning rule for one column.
+
+    Every rule turns the values it matches into missing values. A value
+    matched by an earlier rule for the same column is only counted once,
+    against that earlier rule.
+
+    Example:
+        CleaningRule('Glucose', 'zero_as_missing')
+        CleaningRule('Glucose', 'range', low=44, high=199)
+    """
+
+    column: str
+    kind: str
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+    def __post_init__(self):
+        if self.kind not in RULE_KINDS:
+            raise ValueError(
+                f"Rule kind must be one of {RULE_KINDS}, got {self.kind!r}")
+        if self.kind == 'range' and (self.low is None or self.high is None):
+            raise ValueError(f"Range rule for {self.column} needs low and high")
+
+    @property
+    def name(self) -> str:
+        return f'{self.column}.{self.kind}'
+
+
+def default_rules() -> List[CleaningRule]:
+    """
+    The project's cleaning rules: every column numeric, the count
+    columns integer, the notebook's zero-as-missing columns, then
+    HealthProfile's VALID_RANGES.
+    """
+    columns = list(FEATURE_COLUMNS.values()) + ['Outcome']
+    rules = [CleaningRule(column, 'numeric') for column in columns]
+    rules += [CleaningRule(column, 'integer') for column in INTEGER_COLUMNS]
+    rules += [CleaningRule(column, 'zero_as_missing')
+              for column in ZERO_AS_MISSING_COLUMNS]
+    rules += [CleaningRule(FEATURE_COLUMNS[name], 'range', low, high)
+              for name, (low, high) in VALID_RANGES.items()]
+    return rules
+
+
+class CompiledRules:
+    """
+    A rule set grouped by column, ready to run on chunks.
+
+    Each column is processed once: its values are pulled out as a single
+    array, every rule for it is evaluated as a mask on that array, and
+    the combined mask is applied in one assignment before the column is
+    written back. Adding a rule adds a comparison on a column already in
+    hand, not another scan of the chunk, and no intermediate DataFrames
+    are built. Hit counts fall out of the masks.
+
+    Output types follow the notebook's cleaned CSV: zero-as-missing
+    columns become float64 ("148.0") and columns with an integer rule
+    become nullable Int64 ("6"). The type depends only on the rules, never
+    on what a chunk holds, so every chunk of a file is written the same
+    way whatever the chunk size. Other integer columns stay integers, and
+    become nullable Int64 in chunks where a rule removed values.
+
+    Example:
+        rules = compile_rules(default_rules())
+        for chunk in pd.read_csv(path, chunksize=100_000):
+            rules.apply(chunk, report)
+    """
+
+    def __init__(self, rules: Iterable[CleaningRule]):
+        self.rules = list(rules)
+        self.by_column: Dict[str, List[CleaningRule]] = {}
+        for rule in self.rules:
+            self.by_column.setdefault(rule.column, []).append(rule)
+
+    def apply(self, chunk: pd.DataFrame,
+              report: CleaningReport = None) -> pd.DataFrame:
+        """
+        Run the rules on one chunk, in place.
+
+        Args:
+            chunk: Raw rows; columns without rules are left alone
+            report: If given, its rows and hit counts are increased
+
+        Returns:
+            The cleaned chunk
+        """
+        hits: Dict[str, int] = {}
+        for column, rules in self.by_column.items():
+            if column in chunk.columns:
+                chunk[column] = self._apply_column(chunk[column], rules, hits)
+
+        if report is not None:
+            report.rows += len(chunk)
+            for name, count in hits.items():
+                report.hits[name] = report.hits.get(name, 0) + count
+        return chunk
+
+    def _apply_column(self, series: pd.Series, rules: List[CleaningRule],
+                      hits: Dict[str, int]):
+        # Evaluate every rule on one array and apply them together
+        kinds = {rule.kind for rule in rules}
+        if series.dtype == object and 'numeric' in kinds:
+            missing_before = int(series.isnull().sum())
+            series = pd.to_numeric(series, errors='coerce')
+            hits[f'{series.name}.numeric'] = (
+                int(series.isnull().sum()) - missing_before)
+        elif 'numeric' in kinds:
+            hits[f'{series.name}.numeric'] = 0
+
+        values = series.to_numpy()
+        removed = np.zeros(len(values), dtype=bool)
+        for rule in rules:
+            if rule.kind == 'integer':
+                hit = np.zeros(len(values), dtype=bool)
+                if values.dtype.kind == 'f':
+                    hit = ~np.isnan(values) & (values != np.round(values))
+            elif rule.kind == 'zero_as_missing':
+                hit = values == 0
+            elif rule.kind == 'range':
+                hit = (values < rule.low) | (values > rule.high)
+            else:
+                continue
+            hit &= ~removed
+            removed |= hit
+            hits[rule.name] = int(hit.sum())
+
+        if 'integer' in kinds and 'zero_as_missing' not in kinds:
+            # A float chunk (one with an empty cell) is still Int64
+            if values.dtype.kind == 'f':
+                removed |= np.isnan(values)
+                values = np.where(removed, 0, values)
+            return pd.arrays.IntegerArray(values.astype('int64'), removed)
+        if values.dtype.kind == 'f' or 'zero_as_missing' in kinds:
+            values = values.astype('float64', copy=True)
+            values[removed] = np.nan
+            return values
+        if values.dtype.kind in 'iu' and removed.any():
+            # Integers without an integer rule: masked only where needed
+            return pd.arrays.IntegerArray(values.astype('int64'), removed)
+        return values
+
+
+def compile_rules(rules: Iterable[CleaningRule]) -> CompiledRules:
+    """Group a rule set by column for single-pass execution."""
+    return CompiledRules(rules)
+
+
+DEFAULT_RULES = compile_rules(default_rules())
+
+
+# ============================================================
+# CLEANING
+# ============================================================
+
+def clean_chunk(chunk: pd.DataFrame, report: CleaningReport = None,
+                rules: CompiledRules = None) -> pd.DataFrame:
+    """
+    Clean one chunk of raw rows in place and return it.
+
+    Args:
+        chunk: Raw rows
+        report: If given, its row and hit counts are increased
+        rules: Compiled rules to run (default: DEFAULT_RULES)
+
+    Returns:
+        The cleaned chunk
+    """
+    return (rules or DEFAULT_RULES).apply(chunk, report)
+
+
+def iter_cleaned_chunks(raw_path: str = RAW_PATH,
+                        chunksize: int = DEFAULT_CHUNK_ROWS,
+                        report: CleaningReport = None,
+                        rules: CompiledRules = None) -> Iterator[pd.DataFrame]:
+    """Read the raw file in chunks and yield each chunk cleaned."""
+    for chunk in pd.read_csv(raw_path, chunksize=chunksize):
+        yield clean_chunk(chunk, report, rules)
+
+
+def clean_file(raw_path: str = RAW_PATH, output_path: str = CLEANED_PATH,
+               chunksize: int = DEFAULT_CHUNK_ROWS,
+               output_format: str = 'csv',
+               rules: CompiledRules = None) -> CleaningReport:
+    """
+    Clean a raw file chunk by chunk and stream the result to output_path.
+
+    The output is written to a temporary file and renamed into place, so
+    readers never see a half-written file.
+
+    Args:
+        raw_path: Raw CSV with zeros for missing measurements
+        output_path: Where to write the cleaned data
+        chunksize: Rows held in memory at a time
+        output_format: 'csv' (same layout as the notebook's to_csv) or
+            'feather' (Arrow IPC, readable with pyarrow/pandas)
+        rules: Compiled rules to run (default: DEFAULT_RULES)
+
+    Returns:
+        A CleaningReport with row and per-rule hit counts and timing
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+
+    report = CleaningReport()
+    start = time.perf_counter()
+    chunks = iter_cleaned_chunks(raw_path, chunksize, report, rules)
+
+    write = _write_csv if output_format == 'csv' else _write_feather
+    write_atomic(output_path, lambda tmp_path: write(chunks, tmp_path))
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _write_csv(chunks: Iterator[pd.DataFrame], path: str) -> None:
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def _write_feather(chunks: Iterator[pd.DataFrame], path: str) -> None:
+    # One record batch per chunk, all cast to the first chunk's schema
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pa.ipc.new_file(path, schema)
+            writer.write_table(pa.Table.from_pandas(
+                chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# ============================================================
+# INCREMENTAL REBUILD
+# ============================================================
+# The raw file is cut into chunks of whole lines at content-defined
+# points: a line ends a chunk when a hash of its bytes hits a fixed
+# residue, so editing, adding or removing rows only changes the chunks
+# around the edit and every other chunk keeps its hash. Each chunk's
+# cleaned CSV lines are stored under that hash, and a rebuild only
+# cleans chunks it hasn't seen before.
+
+CHUNK_STORE_SUFFIX = '.chunks'
+MANIFEST_NAME = 'manifest.json'
+
+# Average and maximum raw lines per content-defined chunk
+DEFAULT_AVG_CHUNK_ROWS = 8192
+_MAX_CHUNK_FACTOR = 4
+
+# Raw bytes scanned at a time when looking for chunk boundaries
+_SCAN_BLOCK_BYTES = 4 << 20
+
+# Random 64-bit value per byte; a line's hash is the sum over its bytes
+_GEAR = np.random.default_rng(0x6A09E667).integers(
+    0, 2 ** 63, 256, dtype=np.uint64)
+
+
+def chunk_store_for(output_path: str) -> str:
+    """
+    Get the folder that holds cleaned chunks for an output file, e.g.
+    data/processed/.diabetes_cleaned.csv.chunks
+    """
+    directory, name = os.path.split(os.path.abspath(output_path))
+    return os.path.join(directory, f'.{name}{CHUNK_STORE_SUFFIX}')
+
+
+def _line_chunks(data, start: int, avg_rows: int,
+                 max_rows: int) -> Iterator[Tuple[int, int]]:
+    # Yield (start, stop) byte ranges of content-defined chunks of lines
+    chunk_start = start
+    rows = 0
+    pos = start
+    while pos < len(data):
+        stop = min(pos + _SCAN_BLOCK_BYTES, len(data))
+        if stop < len(data):
+            # Scan whole lines only
+            newline = data.rfind(b'\n', pos, stop)
+            if newline == -1:
+                newline = data.find(b'\n', stop)
+            stop = len(data) if newline == -1 else newline + 1
+
+        block = np.frombuffer(data, dtype=np.uint8, count=stop - pos,
+                              offset=pos)
+        ends = np.flatnonzero(block == 10) + 1
+        if len(ends) == 0 or ends[-1] != len(block):
+            ends = np.append(ends, len(block))
+        starts = np.concatenate([[0], ends[:-1]])
+        line_hashes = np.add.reduceat(_GEAR[block], starts)
+        cuts = np.flatnonzero(line_hashes % np.uint64(avg_rows) == 0)
+
+        line = 0
+        for cut in list(cuts) + [None]:
+            last = len(ends) - 1 if cut is None else cut
+            # Force a cut wherever a chunk would exceed max_rows
+            while rows + last - line + 1 > max_rows:
+                line += max_rows - rows
+                yield chunk_start, pos + int(ends[line - 1])
+                chunk_start, rows = pos + int(ends[line - 1]), 0
+            if cut is None:
+                rows += last - line + 1
+            else:
+                yield chunk_start, pos + int(ends[cut])
+                chunk_start, rows, line = pos + int(ends[cut]), 0, cut + 1
+        pos = stop
+
+    if chunk_start < len(data):
+        yield chunk_start, len(data)
+
+
+def _rules_key(rules: CompiledRules) -> str:
+    # Cached chunks are only valid for the rules that produced them
+    return hashlib.blake2b(repr(rules.rules).encode(),
+                           digest_size=16).hexdigest()
+
+
+def _clean_csv_bytes(header: bytes, body: bytes, rules: CompiledRules,
+                     report: CleaningReport, write_header: bool) -> bytes:
+    # Clean raw CSV lines and format them as the full rebuild would
+    chunk = pd.read_csv(io.BytesIO(header + body))
+    cleaned = clean_chunk(chunk, report, rules)
+    return cleaned.to_csv(index=False, header=write_header).encode()
+
+
+def _read_manifest(store: str) -> Dict[str, object]:
+    try:
+        with open(os.path.join(store, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _write_json(path: str, value) -> None:
+    with open(path, 'w') as f:
+        json.dump(value, f)
+
+
+def rebuild_incremental(raw_path: str = RAW_PATH,
+                        output_path: str = CLEANED_PATH,
+                        avg_chunk_rows: int = DEFAULT_AVG_CHUNK_ROWS,
+                        rules: CompiledRules = None) -> CleaningReport:
+    """
+    Rebuild a cleaned CSV, re-cleaning only raw chunks that changed.
+
+    Cleaned chunks are kept in a hidden folder next to the output (see
+    chunk_store_for) with a manifest listing the current output's chunks,
+    their row counts and rule hits. Chunks no longer referenced are
+    removed after each rebuild.
+
+    The output is byte-identical to a full rebuild: every chunk is
+    formatted exactly as clean_file formats its chunks, and cached bytes
+    are only reused for the same raw bytes, header and rule set.
+
+    Args:
+        raw_path: Raw CSV with zeros for missing measurements
+        output_path: Where to write the cleaned CSV
+        avg_chunk_rows: Average raw lines per chunk; smaller chunks mean
+            less re-cleaning per edit but more files
+        rules: Compiled rules to run (default: DEFAULT_RULES)
+
+    Returns:
+        A CleaningReport; chunks_reused counts chunks taken from the store
+    """
+    rules = rules or DEFAULT_RULES
+    report = CleaningReport()
+    start = time.perf_counter()
+
+    store = chunk_store_for(output_path)
+    os.makedirs(store, exist_ok=True)
+    previous = {entry['hash']: entry
+                for entry in _read_manifest(store).get('chunks', [])}
+    rules_key = _rules_key(rules)
+
+    with open(raw_path, 'rb') as f:
+        data = f.read(0)
+        if os.fstat(f.fileno()).st_size:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            newline = data.find(b'\n')
+            header = bytes(data[:len(data) if newline == -1 else newline + 1])
+            chunk_entries = []
+            for chunk_start, chunk_stop in _line_chunks(
+                    data, len(header), avg_chunk_rows,
+                    avg_chunk_rows * _MAX_CHUNK_FACTOR):
+                body = data[chunk_start:chunk_stop]
+                digest = hashlib.blake2b(
+                    rules_key.encode() + header + body,
+                    digest_size=16).hexdigest()
+                entry = _store_chunk(store, digest, header, body, rules,
+                                     previous)
+                chunk_entries.append(entry)
+                previous[digest] = entry
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def concatenate(tmp_path):
+        with open(tmp_path, 'wb') as out:
+            out.write(_clean_csv_bytes(header, b'', rules, None, True))
+            for entry in chunk_entries:
+                with open(os.path.join(store, f"{entry['hash']}.csv"),
+                          'rb') as f:
+                    shutil.copyfileobj(f, out)
+
+    write_atomic(output_path, concatenate)
+
+    for entry in chunk_entries:
+        report.rows += entry['rows']
+        report.chunks += 1
+        report.chunks_reused += entry.pop('reused')
+        for name, count in entry['hits'].items():
+            report.hits[name] = report.hits.get(name, 0) + count
+
+    manifest = {'rules': rules_key, 'chunks': chunk_entries}
+    write_atomic(os.path.join(store, MANIFEST_NAME),
+                 lambda tmp_path: _write_json(tmp_path, manifest))
+    keep = {f"{entry['hash']}.csv" for entry in chunk_entries} | {MANIFEST_NAME}
+    for name in os.listdir(store):
+        if name not in keep:
+            os.remove(os.path.join(store, name))
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _store_chunk(store: str, digest: str, header: bytes, body: bytes,
+                 rules: CompiledRules,
+                 previous: Dict[str, Dict]) -> Dict[str, object]:
+    # Manifest entry for one chunk, cleaning it only if it isn't stored
+    path = os.path.join(store, f'{digest}.csv')
+    if digest in previous and os.path.exists(path):
+        return dict(previous[digest], reused=True)
+
+    chunk_report = CleaningReport()
+    cleaned = _clean_csv_bytes(header, body, rules, chunk_report, False)
+    write_atomic(path, lambda tmp_path: _write_bytes(tmp_path, cleaned))
+    return {'hash': digest, 'rows': chunk_report.rows,
+            'hits': chunk_report.hits, 'reused': False}
+
+
+# ============================================================
+# COMMAND LINE
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Turn zero placeholders in the raw diabetes data into NaN')
+    parser.add_argument('raw_path', nargs='?', default=RAW_PATH)
+    parser.add_argument('output_path', nargs='?', default=CLEANED_PATH)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--format', dest='output_format', default='csv',
+                        choices=OUTPUT_FORMATS)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only re-clean raw chunks that changed (CSV only)')
+    args = parser.parse_args()
+
+    if args.incremental:
+        if args.output_format != 'csv':
+            parser.error('--incremental only writes CSV')
+        report = rebuild_incremental(args.raw_path, args.output_path)
+    else:
+        report = clean_file(args.raw_path, args.output_path, args.chunksize,
+                            args.output_format)
+    print(f"Cleaned {report.rows:,} records in {report.seconds:.2f}s "
+          f"({report.rows_per_second:,.0f} rows/s)")
+    if args.incremental:
+        print(f"  {report.chunks_reused} of {report.chunks} chunks reused")
+    for name, count in report.hits.items():
+        if count:
+            print(f"  {name}: {count} values -> NaN")
+
+
+if __name__ == "__main__":
+    main()
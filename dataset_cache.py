@@ -0,0 +1,320 @@
+# Helpers for the on-disk sidecar cache used by DiabetesDataset.
+#
+# A parsed CSV is written next to the source file as an uncompressed
+# Feather (Arrow IPC) file, so later loads can memory-map it instead of
+# re-parsing the text. The sidecar records a fingerprint of the source
+# file (size, mtime and content hash) and is ignored once that no longer
+# matches.
+#
+# Small computed results (summary tables, data quality) go in a second,
+# JSON sidecar with the same fingerprint check, so a new process can reuse
+# them without loading the data at all.
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from atomic_file import write_atomic
+
+
+CACHE_SUFFIX = '.cache.feather'
+RESULTS_SUFFIX = '.stats.json'
+FINGERPRINT_KEY = b'diabetes_dataset.fingerprint'
+
+# Read the source in 1 MiB blocks when hashing it
+_HASH_BLOCK_SIZE = 1 << 20
+
+# Row filter operators, evaluated inside Arrow before pandas conversion
+_ARROW_OPS = {
+    '==': pc.equal,
+    '!=': pc.not_equal,
+    '<': pc.less,
+    '<=': pc.less_equal,
+    '>': pc.greater,
+    '>=': pc.greater_equal,
+}
+
+
+def cache_path_for(filepath: str, variant: Optional[str] = None) -> str:
+    """
+    Get the sidecar cache path for a source file.
+
+    The sidecar is a hidden file in the same folder, e.g.
+    data/processed/.diabetes_cleaned.csv.cache.feather
+
+    Args:
+        filepath: The source CSV
+        variant: Optional tag for a differently-typed copy of the same
+            source (e.g. 'compact'), which gets its own sidecar
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    if variant:
+        name = f'{name}.{variant}'
+    return os.path.join(directory, f'.{name}{CACHE_SUFFIX}')
+
+
+def results_path_for(filepath: str) -> str:
+    """
+    Get the computed-results sidecar path for a source file, e.g.
+    data/processed/.diabetes_cleaned.csv.stats.json
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, f'.{name}{RESULTS_SUFFIX}')
+
+
+def hash_file(filepath: str) -> str:
+    """Return a hex content hash of the file at filepath."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(filepath: str) -> Dict[str, object]:
+    """
+    Describe the current state of a source file.
+
+    Returns:
+        Dictionary with the file's size, mtime (ns) and content hash
+    """
+    stat = os.stat(filepath)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': hash_file(filepath),
+    }
+
+
+def fingerprint_matches(stored: Dict[str, object], filepath: str) -> bool:
+    """
+    Check whether a stored fingerprint still describes filepath.
+
+    Size and mtime are checked first because they are free. If only the
+    mtime changed (e.g. the file was copied or touched) the content hash
+    decides, so an unchanged file never forces a rebuild. A hash match is
+    recorded with the new mtime in the results sidecar, so the file is
+    hashed once per touch rather than on every later load.
+    """
+    stat = os.stat(filepath)
+    if stored.get('size') != stat.st_size:
+        return False
+    if stored.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+
+    verified = (_read_results_file(filepath) or {}).get('fingerprint', {})
+    if (verified.get('hash') == stored.get('hash')
+            and verified.get('size') == stat.st_size
+            and verified.get('mtime_ns') == stat.st_mtime_ns):
+        return True
+
+    current = hash_file(filepath)
+    if stored.get('hash') != current:
+        return False
+    _record_fingerprint(filepath, {'size': stat.st_size,
+                                   'mtime_ns': stat.st_mtime_ns,
+                                   'hash': current})
+    return True
+
+
+def _record_fingerprint(filepath: str, fingerprint: Dict[str, object]) -> None:
+    # Update the results sidecar's fingerprint to a verified one, keeping
+    # its results if they are for the same contents
+    stored = _read_results_file(filepath)
+    if (stored is None
+            or stored.get('fingerprint', {}).get('hash') != fingerprint['hash']):
+        stored = {'results': {}}
+    stored['fingerprint'] = fingerprint
+    _write_results_file(filepath, stored)
+
+
+def _schema_matches(schema: pa.Schema, filepath: str) -> bool:
+    # Compare the fingerprint stored in a sidecar's schema to the source
+    metadata = schema.metadata or {}
+    stored = json.loads(metadata.get(FINGERPRINT_KEY, b'{}'))
+    return fingerprint_matches(stored, filepath)
+
+
+def read_cached_frame(
+        filepath: str, variant: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[List[Tuple[str, str, float]]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Load the cached DataFrame for filepath if a valid sidecar exists.
+
+    Args:
+        filepath: The source CSV
+        variant: Which sidecar to read (see cache_path_for)
+        columns: Only read these columns, in this order
+        filters: (column, operator, value) conditions that rows must all
+            meet; they are applied to the Arrow table so non-matching rows
+            never become pandas rows. Missing values never match.
+
+    Returns:
+        The cached DataFrame, or None if there is no usable cache
+    """
+    path = cache_path_for(filepath, variant)
+    if not os.path.exists(path):
+        return None
+
+    filters = filters or []
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(
+            list(columns) + [column for column, _, _ in filters]))
+
+    try:
+        table = feather.read_table(path, columns=read_columns,
+                                   memory_map=True)
+    except (OSError, pa.ArrowInvalid, KeyError):
+        return None  # Unreadable or half-written sidecar, treat as a miss
+
+    if not _schema_matches(table.schema, filepath):
+        return None
+
+    table = filter_table(table, filters)
+    if columns is not None:
+        table = table.select(list(columns))
+
+    return table.to_pandas()
+
+
+def read_cached_dtypes(filepath: str,
+                       variant: Optional[str] = None) -> Optional[pd.Series]:
+    """
+    Get the column dtypes stored in a valid sidecar without loading rows.
+
+    Only the Arrow schema is read, so this is cheap even for huge caches.
+
+    Returns:
+        Series of dtypes indexed by column name, or None if there is no
+        usable cache
+    """
+    path = cache_path_for(filepath, variant)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    if not _schema_matches(schema, filepath):
+        return None
+
+    return schema.empty_table().to_pandas().dtypes
+
+
+def filter_table(table: pa.Table,
+                 filters: Optional[List[Tuple[str, str, float]]]) -> pa.Table:
+    """
+    Keep the rows of an Arrow table that meet every filter condition.
+
+    Missing values never match, the same as DiabetesDataset's pandas path.
+    """
+    if not filters:
+        return table
+
+    mask = None
+    for column, op, value in filters:
+        condition = pc.fill_null(_ARROW_OPS[op](table[column], value), False)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table.filter(mask)
+
+
+def write_cached_frame(filepath: str, df: pd.DataFrame,
+                       fingerprint: Dict[str, object],
+                       variant: Optional[str] = None) -> bool:
+    """
+    Write df as the sidecar cache for filepath.
+
+    The fingerprint should be taken *before* the source was read, so a
+    file that changes mid-load never gets a cache that looks valid.
+    The file is written to a temporary name and renamed into place.
+
+    Returns:
+        True if the cache was written, False if the folder isn't writable
+    """
+    path = cache_path_for(filepath, variant)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[FINGERPRINT_KEY] = json.dumps(fingerprint).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    try:
+        # Uncompressed so the file can be memory-mapped without a copy
+        write_atomic(path, lambda tmp_path: feather.write_feather(
+            table, tmp_path, compression='uncompressed'))
+    except OSError:
+        return False
+    return True
+
+
+def _read_results_file(filepath: str) -> Optional[Dict[str, object]]:
+    # The parsed results sidecar, or None if missing or unreadable
+    try:
+        with open(results_path_for(filepath)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_cached_result(filepath: str, key: str) -> Optional[object]:
+    """
+    Look up a computed result stored for filepath's current contents.
+
+    Args:
+        filepath: The source CSV
+        key: Which result, including any settings it depends on
+
+    Returns:
+        The stored JSON value, or None if absent or out of date
+    """
+    stored = _read_results_file(filepath)
+    if stored is None or key not in stored.get('results', {}):
+        return None
+    if not fingerprint_matches(stored.get('fingerprint', {}), filepath):
+        return None
+    return stored['results'][key]
+
+
+def write_cached_result(filepath: str, key: str, value: object,
+                        fingerprint: Dict[str, object]) -> bool:
+    """
+    Store a computed result for the contents described by fingerprint.
+
+    Results for the same contents are kept side by side; a new
+    fingerprint replaces everything stored for the old one.
+
+    Returns:
+        True if the sidecar was written, False if the folder isn't writable
+    """
+    stored = _read_results_file(filepath)
+    if (stored is None
+            or stored.get('fingerprint', {}).get('hash') != fingerprint['hash']):
+        stored = {'fingerprint': fingerprint, 'results': {}}
+    stored['fingerprint'] = fingerprint
+    stored['results'][key] = value
+    return _write_results_file(filepath, stored)
+
+
+def _write_results_file(filepath: str, stored: Dict[str, object]) -> bool:
+    # Write the results sidecar atomically; False if the folder isn't
+    # writable
+    def dump(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(stored, f)
+
+    try:
+        write_atomic(results_path_for(filepath), dump)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,221 @@
+# Mergeable statistics for DiabetesDataset.
+#
+# A StatsAccumulator can be built on any chunk, shard or in-memory frame
+# and merged with others built elsewhere (another chunk, another process,
+# another machine). Merging is associative, so partial results can be
+# combined in any grouping - the map-reduce pattern - and the result
+# matches a single pass over all the rows up to floating-point rounding.
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import KLLSketch
+
+
+# KLL sketch size for each column's quantiles. Quantiles are exact up to
+# this many values and within ~0.3% in rank beyond (see quantile_sketch.py)
+DEFAULT_SKETCH_K = 1000
+
+SUMMARY_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+# Rows are also summarised per value of this column when it is present
+CLASS_COLUMN = 'Outcome'
+
+
+# ============================================================
+# THE ACCUMULATOR
+# ============================================================
+
+class StatsAccumulator:
+    """
+    Per-column count, missing, sum, mean/M2, min, max and quantile sketch.
+
+    The numeric state is kept as arrays with one entry per column, so an
+    update is a handful of vectorised operations per chunk. Each chunk's
+    (count, mean, M2) is folded in with Chan et al.'s pairwise form of
+    Welford's update, which is also what merge() uses, so chunked, merged
+    and single-pass results agree.
+
+    When the rows have an Outcome column, a nested accumulator is kept
+    for each outcome class in `by_class`.
+
+    Example:
+        stats = StatsAccumulator()
+        for chunk in pd.read_csv(path, chunksize=100_000):
+            stats.update(chunk)
+        stats.summary()
+        stats.by_class[1].summary()   # diabetic patients only
+
+        # Or build partials anywhere and combine them
+        total = StatsAccumulator().merge(part_a).merge(part_b)
+    """
+
+    def __init__(self, sketch_k: int = DEFAULT_SKETCH_K, seed: int = 0,
+                 class_column: Optional[str] = CLASS_COLUMN):
+        self.sketch_k = sketch_k
+        self.class_column = class_column
+        self.rows = 0
+        self.columns: Optional[List[str]] = None
+        self.numeric_columns: Optional[List[str]] = None
+        self.by_class: Dict[object, 'StatsAccumulator'] = {}
+
+        # missing has one entry per column, the rest one per numeric column
+        self.missing: Optional[np.ndarray] = None
+        self.count: Optional[np.ndarray] = None
+        self.sum: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.m2: Optional[np.ndarray] = None
+        self.min: Optional[np.ndarray] = None
+        self.max: Optional[np.ndarray] = None
+        self.sketches: List[KLLSketch] = []
+
+        self._rng = np.random.default_rng(seed)
+
+    def _start(self, columns: List[str], numeric_columns: List[str]) -> None:
+        # Zeroed state for a set of columns
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns)
+        width = len(self.numeric_columns)
+
+        self.missing = np.zeros(len(self.columns), dtype=np.int64)
+        self.count = np.zeros(width, dtype=np.int64)
+        self.sum = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+        self.sketches = [KLLSketch(self.sketch_k, self._rng)
+                         for _ in range(width)]
+
+    def _new_class_accumulator(self) -> 'StatsAccumulator':
+        child = StatsAccumulator(self.sketch_k, class_column=None)
+        child._rng = self._rng
+        child._start(self.columns, self.numeric_columns)
+        return child
+
+    # ============================================================
+    # UPDATING
+    # ============================================================
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Fold one chunk of rows into the statistics."""
+        if self.columns is None:
+            self._start(chunk.columns,
+                        chunk.select_dtypes(include='number').columns)
+
+        self._update_values(chunk)
+
+        if self.class_column in self.columns:
+            for value, group in chunk.groupby(self.class_column, sort=True):
+                key = value.item() if hasattr(value, 'item') else value
+                if key not in self.by_class:
+                    self.by_class[key] = self._new_class_accumulator()
+                self.by_class[key]._update_values(group)
+
+    def _update_values(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        self.missing += chunk[self.columns].isnull().to_numpy().sum(axis=0)
+
+        values = chunk[self.numeric_columns].to_numpy(
+            dtype='float64', na_value=np.nan)
+        if len(values) == 0:
+            return
+
+        observed = ~np.isnan(values)
+        n_b = observed.sum(axis=0)
+        sum_b = np.where(observed, values, 0.0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = sum_b / n_b
+            m2_b = np.where(observed, (values - mean_b) ** 2, 0.0).sum(axis=0)
+
+        self._combine(n_b, sum_b, np.nan_to_num(mean_b), m2_b)
+        self.min = np.minimum(
+            self.min, np.where(observed, values, np.inf).min(axis=0))
+        self.max = np.maximum(
+            self.max, np.where(observed, values, -np.inf).max(axis=0))
+
+        for i, sketch in enumerate(self.sketches):
+            sketch.update(values[observed[:, i], i])
+
+    def _combine(self, n_b: np.ndarray, sum_b: np.ndarray,
+                 mean_b: np.ndarray, m2_b: np.ndarray) -> None:
+        # Chan et al.: merge (count, mean, M2) of a second group of values
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        weight = np.divide(n_b, n, out=np.zeros(len(n)), where=n > 0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2_b + delta ** 2 * n_a * weight
+        self.count = n
+        self.sum = self.sum + sum_b
+
+    def merge(self, other: 'StatsAccumulator') -> 'StatsAccumulator':
+        """
+        Fold another accumulator (e.g. of a different shard) into this one.
+
+        Args:
+            other: Accumulator over the same columns
+
+        Returns:
+            self, so merges can be chained or used with functools.reduce
+        """
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self._start(other.columns, other.numeric_columns)
+        elif other.columns != self.columns:
+            raise ValueError("Can't merge statistics of different columns")
+
+        self.rows += other.rows
+        self.missing = self.missing + other.missing
+        self._combine(other.count, other.sum, other.mean, other.m2)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+
+        for key, other_class in other.by_class.items():
+            if key not in self.by_class:
+                self.by_class[key] = self._new_class_accumulator()
+            self.by_class[key].merge(other_class)
+        return self
+
+    # ============================================================
+    # RESULTS
+    # ============================================================
+
+    def missing_counts(self) -> pd.Series:
+        """Missing values per column, like df.isnull().sum()."""
+        return pd.Series(self.missing, index=self.columns, dtype='int64')
+
+    def data_quality(self) -> float:
+        """Percentage of non-missing cells, rounded to one decimal."""
+        total = self.rows * len(self.columns)
+        quality = (1 - self.missing.sum() / total) * 100
+        return round(quality, 1)
+
+    def summary(self) -> pd.DataFrame:
+        """Statistics in the same layout as df.describe()."""
+        count = self.count.astype('float64')
+        has_values = count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (count - 1))
+        std[count < 2] = np.nan
+
+        quartiles = np.array([
+            sketch.quantile([0.25, 0.5, 0.75]) for sketch in self.sketches
+        ]).reshape(-1, 3)
+
+        rows: Dict[str, np.ndarray] = {
+            'count': count,
+            'mean': np.where(has_values, self.mean, np.nan),
+            'std': std,
+            'min': np.where(has_values, self.min, np.nan),
+            '25%': quartiles[:, 0],
+            '50%': quartiles[:, 1],
+            '75%': quartiles[:, 2],
+            'max': np.where(has_values, self.max, np.nan),
+        }
+        return pd.DataFrame(rows, index=self.numeric_columns).T.loc[SUMMARY_INDEX]
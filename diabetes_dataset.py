@@ -1,30 +1,839 @@
 # Class to handle loading and preprocessing of
 # the diabetes dataset
 
+import csv
+import glob
+import json
+import mmap
+import operator
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from data_cleaning import ZERO_AS_MISSING_COLUMNS
+from dataset_cache import (file_fingerprint, filter_table, read_cached_dtypes,
+                           read_cached_frame, read_cached_result,
+                           write_cached_frame, write_cached_result)
+from dataset_stats import CLASS_COLUMN, StatsAccumulator
+from imputation import (DEFAULT_NEIGHBOURS, IMPUTE_COLUMNS, IMPUTE_METHODS,
+                        KNNImputer, MedianImputer, impute_chunks)
+from missing_bitmap import MissingBitmap
+
+# Percentiles stored per feature in reference/diabetes_reference_data.json
+REFERENCE_PERCENTILES = (10, 25, 50, 75, 90)
+
+# Rows sampled to guess dtypes when nothing has been loaded yet
+DTYPE_SAMPLE_ROWS = 1000
+
+# Rows per chunk in streaming mode when no memory limit is given
+DEFAULT_CHUNK_ROWS = 100_000
+
+# The C parser briefly holds a few copies of each chunk while converting
+# it, so budget this many times a chunk's final in-memory size
+_PARSE_OVERHEAD = 3
+
+# Count newlines in 8 MiB slices of the memory-mapped file
+_LINE_COUNT_BLOCK = 8 << 20
+
+# ============================================================
+# COMPACT DTYPE PLAN
+# ============================================================
+# Smallest dtypes that hold each column of the diabetes schema.
+# pd.read_csv would give int64/float64 for all of these. The five
+# columns where the cleaning step turns 0 into NaN use pandas nullable
+# integers so missing values don't force a float64 column.
+
+COMPACT_DTYPES = {
+    'Pregnancies': 'uint8',                 # 0-17
+    'Glucose': 'UInt16',                    # 44-199, room for lab extremes
+    'BloodPressure': 'UInt8',               # 24-122
+    'SkinThickness': 'UInt8',               # 7-99
+    'Insulin': 'UInt16',                    # 14-846
+    'BMI': 'float32',                       # 18.2-67.1
+    'DiabetesPedigreeFunction': 'float32',  # 0.078-2.42
+    'Age': 'uint8',                         # 21-81
+    'Outcome': 'uint8',                     # 0 or 1
+}
+
+
+def _read_header(filepath):
+    # Column names from the first line of a CSV
+    with open(filepath, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def _count_data_lines(filepath):
+    # Number of records in a CSV (lines minus the header), without parsing.
+    # Assumes no quoted fields contain newlines, which holds for this data.
+    # Blank lines at the end are not records (pd.read_csv skips them).
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size
+            while end > 0 and mm[end - 1:end] in (b'\n', b'\r', b' ', b'\t'):
+                end -= 1
+            if end == 0:
+                return 0
+
+            lines = 1  # The last non-blank line
+            for start in range(0, end, _LINE_COUNT_BLOCK):
+                lines += mm[start:min(start + _LINE_COUNT_BLOCK, end)].count(b'\n')
+
+    return max(lines - 1, 0)
+
+
+# Column types for the Arrow CSV reader. They match what pd.read_csv
+# infers, so both engines produce identical frames.
+ARROW_COLUMN_TYPES = {
+    'Pregnancies': pa.int64(),
+    'Glucose': pa.float64(),
+    'BloodPressure': pa.float64(),
+    'SkinThickness': pa.float64(),
+    'Insulin': pa.float64(),
+    'BMI': pa.float64(),
+    'DiabetesPedigreeFunction': pa.float64(),
+    'Age': pa.int64(),
+    'Outcome': pa.int64(),
+}
+
+ENGINES = ('pandas', 'pyarrow')
+
+# ============================================================
+# ROW FILTERS
+# ============================================================
+# A filter is a list of (column, operator, value) conditions that must all
+# hold, or a string such as "Outcome == 1 and Age >= 50".
+
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+_CONDITION_PATTERN = re.compile(
+    r'^\s*(\w+)\s*(==|!=|<=|>=|<|>)\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)\s*$')
+
+
+def parse_filter(expression):
+    # Turn a filter string or list of conditions into (column, op, value)
+    # tuples, raising ValueError for anything that isn't understood
+    if expression is None:
+        return []
+
+    if isinstance(expression, str):
+        conditions = []
+        for part in re.split(r'\s+and\s+', expression.strip()):
+            match = _CONDITION_PATTERN.match(part)
+            if match is None:
+                raise ValueError(f"Can't parse filter condition: {part!r}")
+            column, op, value = match.groups()
+            conditions.append((column, op, float(value)))
+        return conditions
+
+    conditions = []
+    for column, op, value in expression:
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op!r}")
+        conditions.append((column, op, float(value)))
+    return conditions
+
+
+def _filter_mask(df, filters):
+    # Boolean mask of rows meeting every condition; missing values never match
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        values = df[column].to_numpy(dtype='float64', na_value=np.nan)
+        mask &= FILTER_OPERATORS[op](values, value) & ~np.isnan(values)
+    return mask
+
+
+def _downcast(series, dtype):
+    # Convert one column to a compact dtype, refusing to overflow or
+    # truncate (plain astype would silently wrap 300 to 44 in a uint8)
+    target = np.dtype(dtype.lower())
+    if target.kind == 'f':
+        return series.astype(dtype)
+
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    observed = values[~np.isnan(values)]
+    limits = np.iinfo(target)
+    if len(observed) < len(values) and dtype == dtype.lower():
+        raise ValueError(
+            f"{series.name} has missing values and can't be stored as {dtype}")
+    if len(observed) and (
+            observed.min() < limits.min or observed.max() > limits.max
+            or not np.array_equal(observed, np.round(observed))):
+        raise ValueError(
+            f"{series.name} has values that don't fit in {dtype}")
+    return series.astype(dtype)
+
+
+def _apply_dtype_plan(df, plan):
+    # Downcast the columns of df that appear in plan, in place
+    for column, dtype in plan.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = _downcast(df[column], dtype)
+    return df
+
+
+def _inferred_dtype(dtype):
+    # The dtype pd.read_csv would have picked for a planned column
+    if np.dtype(dtype.lower()).kind == 'f' or dtype != dtype.lower():
+        return np.dtype('float64')
+    return np.dtype('int64')
+
+
+def _stat_key(filepath):
+    # Cheap change detector for a file: (size, mtime in ns)
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _resolve_shards(filepath):
+    # The CSV files behind a directory or glob pattern, or None when
+    # filepath is a single file
+    if os.path.isdir(filepath):
+        paths = glob.glob(os.path.join(filepath, '*.csv'))
+    elif any(char in filepath for char in '*?['):
+        paths = glob.glob(filepath)
+    else:
+        return None
+
+    if not paths:
+        raise FileNotFoundError(f"No CSV shards found at {filepath}")
+    return sorted(paths)
+
+
+# Per-shard work for the process pool. These build a single-file dataset
+# inside the worker, so only the path and options are sent across.
+
+def _load_shard(path, options):
+    dataset = DiabetesDataset(path, **options)
+    return dataset.df, dataset.cache_hit
+
+
+def _summarise_shard(path, options):
+    return DiabetesDataset(path, streaming=True, **options)._statistics()
+
+
+def _count_shard(path, options):
+    return DiabetesDataset(path, lazy=True, **options).get_record_count()
+
+
+def _chunk_rows_for_memory(filepath, memory_limit_mb):
+    # How many rows fit in memory_limit_mb once parsed, based on a sample
+    sample = pd.read_csv(filepath, nrows=DTYPE_SAMPLE_ROWS)
+    if len(sample) == 0:
+        return DEFAULT_CHUNK_ROWS
+    row_bytes = sample.memory_usage(index=False, deep=True).sum() / len(sample)
+    budget = memory_limit_mb * 1024 * 1024 / _PARSE_OVERHEAD
+    return max(int(budget // row_bytes), 1)
 
 
 class DiabetesDataset:
     # loops and holds the diabetes dataset
+    #
+    # By default the parsed CSV is cached in a Feather sidecar next to the
+    # source file (see dataset_cache.py), so later loads skip the CSV parse.
+    # cache_hit tells you whether the last load came from that cache
+    # (None when caching is turned off).
+    #
+    # With lazy=True nothing is parsed up front: record count, columns and
+    # dtypes are answered from the file itself, and the DataFrame is only
+    # loaded the first time a method needs the values.
+    #
+    # With streaming=True the file is never loaded as a whole. Statistics
+    # are computed by walking it in chunks (see dataset_stats.py), either
+    # chunksize rows at a time or as many rows as fit in memory_limit_mb.
+    #
+    # With compact=True columns are stored with the COMPACT_DTYPES plan
+    # instead of int64/float64; memory_report() shows the saving.
+    #
+    # columns= and filter= are pushed into the read itself: the CSV parser
+    # only converts the needed columns, and rows failing the filter are
+    # dropped chunk by chunk (or inside Arrow for the cache) before they
+    # reach the dataset. A projected or filtered load reuses a valid cache
+    # but never writes one, since that would mean parsing everything.
+    #
+    # engine='pyarrow' parses full loads with Arrow's multi-threaded CSV
+    # reader using ARROW_COLUMN_TYPES instead of type inference. Chunked
+    # reads (streaming, iter_chunks) always use the pandas parser.
+    #
+    # filepath may also be a directory of CSV shards or a glob pattern.
+    # Shards are loaded in parallel on a pool of `workers` processes (each
+    # with its own cache sidecar) and joined in sorted path order;
+    # get_shard_provenance() maps row ranges back to files. Until the rows
+    # are loaded, counts and statistics are computed per shard in the pool
+    # and merged, without building the combined DataFrame.
+    #
+    # get_summary and get_data_quality results are memoized per dataset
+    # version, and for single files also saved in a JSON sidecar keyed by
+    # the file's fingerprint, so a fresh process serving the same file gets
+    # them without touching the data.
+    #
+    # append(rows) adds records in memory (the source file is unchanged)
+    # and folds them into running statistics, so counts, missing values,
+    # means, variances, min/max and data quality update in O(new rows).
+    #
+    # When the rows are loaded a MissingBitmap (see missing_bitmap.py)
+    # records which zero-as-missing columns each row lacks, in one byte per
+    # row. Complete cases, missing-pattern counts and the zero-as-missing
+    # columns' missing counts come from that byte instead of new isnull()
+    # scans. Streaming data keeps only the bitmap's pattern histogram, so
+    # its memory doesn't grow with the file.
+
+    def __init__(self, filepath, use_cache=True, refresh_cache=False,
+                 lazy=False, streaming=False, chunksize=None,
+                 memory_limit_mb=None, compact=False, columns=None,
+                 filter=None, engine='pandas', workers=None):
+        if engine not in ENGINES:
+            raise ValueError(
+                f"engine must be one of {ENGINES}, got {engine!r}")
 
-    def __init__(self, filepath):
         self.filepath = filepath
-        self.df = pd.read_csv(filepath)
+        sharded = _resolve_shards(filepath)
+        self.is_sharded = sharded is not None
+        self.shards = sharded or [filepath]
+        self.workers = workers or os.cpu_count()
+        self.engine = engine
+        self.use_cache = use_cache
+        self.cache_hit = None
+        self.streaming = streaming
+        self.dtype_plan = COMPACT_DTYPES if compact else {}
+        self.columns = list(columns) if columns is not None else None
+        self.filters = parse_filter(filter)
+        self._refresh_pending = refresh_cache
+        self._df = None
+        self._stats = None
+        self._shard_rows = None
+        self._bitmap = None
+
+        # Rows added with append() that aren't in _df yet
+        self._appended = []
+
+        # Bumped whenever the rows change, invalidating memoized results
+        self._version = 0
+        self._results = {}
+        self._source_stat = None if self.is_sharded else _stat_key(filepath)
+
+        if chunksize is None and memory_limit_mb is not None:
+            chunksize = _chunk_rows_for_memory(self.shards[0], memory_limit_mb)
+        self.chunksize = chunksize or DEFAULT_CHUNK_ROWS
+
+        if not (lazy or streaming):
+            self._df = self._load()
+            self._bitmap = self._index_missing(self._df)
+
+    @property
+    def df(self):
+        if self.streaming:
+            raise ValueError(
+                "A streaming DiabetesDataset never holds the full DataFrame; "
+                "use iter_chunks() instead")
+        if self._df is None:
+            self._df = self._load()
+        if self._appended:
+            # Join appended rows only when the frame is actually used
+            self._df = pd.concat([self._df, *self._appended], ignore_index=True)
+            self._appended = []
+        if self._bitmap is None:
+            self._bitmap = self._index_missing(self._df)
+        return self._df
+
+    @property
+    def is_loaded(self):
+        return self._df is not None
+
+    def _index_missing(self, df):
+        return MissingBitmap.from_frame(df, ZERO_AS_MISSING_COLUMNS)
+
+    def _missing_bitmap(self):
+        # The bitmap of the current rows; streaming data is counted in one
+        # walk over the chunks (histogram only), anything else is indexed
+        # when the rows are loaded
+        if self._bitmap is None:
+            if self.streaming:
+                columns = self.get_columns()
+                bitmap = MissingBitmap([column for column in ZERO_AS_MISSING_COLUMNS
+                                        if column in columns], keep_rows=False)
+                for chunk in self.iter_chunks():
+                    bitmap.extend(chunk)
+                self._bitmap = bitmap
+            else:
+                self.df
+        return self._bitmap
+
+    @property
+    def _cache_variant(self):
+        # Compact frames get their own sidecar so both layouts can coexist
+        return 'compact' if self.dtype_plan else None
+
+    def _load(self):
+        if self.is_sharded:
+            return self._load_shards()
+
+        refresh_cache = self._refresh_pending
+        self._refresh_pending = False
+
+        if not self.use_cache:
+            return self._read_source()
+
+        if not refresh_cache:
+            df = read_cached_frame(self.filepath, self._cache_variant,
+                                   self.columns, self.filters)
+            if df is not None:
+                self.cache_hit = True
+                return df
+
+        self.cache_hit = False
+        if self.columns is not None or self.filters:
+            return self._read_source()
+
+        # Fingerprint before reading so a mid-load edit can't look cached
+        fingerprint = file_fingerprint(self.filepath)
+        df = self._read_source()
+        write_cached_frame(self.filepath, df, fingerprint, self._cache_variant)
+        return df
+
+    def _shard_options(self):
+        # Constructor arguments that make a single-shard dataset behave
+        # like this one
+        return {
+            'use_cache': self.use_cache,
+            'refresh_cache': self._refresh_pending,
+            'chunksize': self.chunksize,
+            'compact': bool(self.dtype_plan),
+            'columns': self.columns,
+            'filter': self.filters,
+            'engine': self.engine,
+        }
+
+    def _map_shards(self, func):
+        # Run func(path, options) for every shard, on the process pool
+        # when there is more than one shard and worker
+        options = self._shard_options()
+        if self.workers == 1 or len(self.shards) == 1:
+            return [func(path, options) for path in self.shards]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(
+                func, self.shards, [options] * len(self.shards)))
+
+    def _load_shards(self):
+        results = self._map_shards(_load_shard)
+        self._refresh_pending = False
+        if self.use_cache:
+            self.cache_hit = all(hit for _, hit in results)
+        frames = [df for df, _ in results]
+        self._shard_rows = [len(df) for df in frames]
+        return pd.concat(frames, ignore_index=True)
+
+    def get_shard_provenance(self):
+        # Which rows of the combined dataset came from which file
+        if self._shard_rows is not None:
+            rows = self._shard_rows
+        elif self.streaming:
+            rows = [summary.rows
+                    for summary in self._map_shards(_summarise_shard)]
+        else:
+            rows = self._map_shards(_count_shard)
+
+        stops = np.cumsum(rows, dtype=np.int64)
+        return pd.DataFrame({
+            'shard': self.shards,
+            'rows': rows,
+            'start': stops - rows,
+            'stop': stops,
+        })
+
+    def _read_source(self):
+        if self.engine == 'pyarrow':
+            return self._read_source_arrow()
+        if not self.dtype_plan and not self.filters:
+            return self._project(
+                pd.read_csv(self.filepath, usecols=self._usecols()))
+        # Downcast and filter chunk by chunk so only one chunk is ever held
+        # in full, then join the kept pieces
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return self._read_head(0)
+        return pd.concat(chunks, ignore_index=True)
+
+    def _read_source_arrow(self):
+        # Whole-file parse on all cores; projection and filtering happen in
+        # Arrow so dropped columns and rows never become pandas objects
+        usecols = self._usecols()
+        header = usecols if usecols is not None else _read_header(self.filepath)
+        convert_options = pa_csv.ConvertOptions(
+            column_types={column: ARROW_COLUMN_TYPES[column]
+                          for column in header if column in ARROW_COLUMN_TYPES},
+            include_columns=usecols)
+        table = pa_csv.read_csv(
+            self.filepath,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=convert_options)
+
+        table = filter_table(table, self.filters)
+        if self.columns is not None:
+            table = table.select(self.columns)
+        return _apply_dtype_plan(table.to_pandas(), self.dtype_plan)
+
+    def _usecols(self):
+        # Columns the parser has to convert: the projection plus any
+        # column a filter condition looks at
+        if self.columns is None:
+            return None
+        return list(dict.fromkeys(
+            self.columns + [column for column, _, _ in self.filters]))
+
+    def _project(self, df):
+        # Keep the requested columns, in the order they were asked for
+        if self.columns is None or list(df.columns) == self.columns:
+            return df
+        return df[self.columns]
+
+    def iter_chunks(self):
+        # Walk the source file(s) as DataFrames of at most chunksize rows,
+        # already projected, filtered and downcast
+        for path in self.shards:
+            reader = pd.read_csv(path, chunksize=self.chunksize,
+                                 usecols=self._usecols())
+            for chunk in reader:
+                if self.filters:
+                    chunk = chunk[_filter_mask(chunk, self.filters)]
+                chunk = _apply_dtype_plan(chunk, self.dtype_plan)
+                yield self._project(chunk)
+        if self.streaming:
+            yield from self._appended
+
+    def _statistics(self):
+        # Mergeable statistics of the current rows (see dataset_stats.py),
+        # built once and then kept up to date by append(). Streaming data
+        # is summarised chunk by chunk, unloaded shards in parallel and
+        # merged, and anything in memory in a single update.
+        if self._stats is None:
+            if not self._uses_shard_stats():
+                stats = StatsAccumulator()
+                stats.update(self.df)
+            elif self.is_sharded:
+                stats = reduce(StatsAccumulator.merge,
+                               self._map_shards(_summarise_shard),
+                               StatsAccumulator())
+            else:
+                stats = StatsAccumulator()
+                for chunk in self.iter_chunks():
+                    stats.update(chunk)
+            self._stats = stats
+        return self._stats
+
+    def _uses_shard_stats(self):
+        # Aggregates come from merged per-shard summaries rather than a
+        # combined DataFrame (always the case when streaming)
+        return self.streaming or (self.is_sharded and not self.is_loaded)
+
+    def refresh_cache(self):
+        # Re-parse the source file and rewrite the sidecar cache
+        # Appended rows only lived in memory, so they are dropped too
+        self._refresh_pending = True
+        self._stats = None
+        self._bitmap = None
+        self._appended = []
+        self._source_stat = None if self.is_sharded else _stat_key(self.filepath)
+        self._df = self._load()
+        self._bitmap = self._index_missing(self._df)
+        self._version += 1
+
+    def append(self, rows):
+        # Add records (a DataFrame, a dict or a list of dicts) and update
+        # the running statistics from the new rows only
+        new = self._normalise_rows(rows)
+        if len(new) == 0:
+            return
+
+        self._statistics().update(new)
+        if self._bitmap is not None:
+            self._bitmap.extend(new)
+        self._appended.append(new)
+        self._version += 1
+
+    def _normalise_rows(self, rows):
+        # New rows shaped, filtered and typed like the existing ones
+        if isinstance(rows, dict):
+            rows = [rows]
+        new = pd.DataFrame(rows)
+
+        columns = self._usecols() or self.get_columns()
+        unknown = set(new.columns) - set(columns)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        new = new.reindex(columns=columns).apply(pd.to_numeric)
+
+        if self.filters:
+            new = new[_filter_mask(new, self.filters)]
+        new = _apply_dtype_plan(new, self.dtype_plan)
+        return self._project(new).reset_index(drop=True)
+
+    def _result_key(self, name):
+        # Identifies a result together with the settings it depends on
+        return json.dumps({
+            'result': name,
+            'compact': bool(self.dtype_plan),
+            'columns': self.columns,
+            'filters': self.filters,
+            'estimated': self._uses_shard_stats(),
+        }, sort_keys=True)
+
+    def _can_persist_results(self):
+        # Only results that describe the file as it is on disk right now
+        return (self.use_cache and not self.is_sharded and self._version == 0
+                and not self._refresh_pending
+                and self._source_stat == _stat_key(self.filepath))
+
+    def _cached_result(self, name, compute):
+        # Memoized, persisted result of compute() for the current version.
+        # The key includes whether the result is a shard-sketch estimate,
+        # so loading a sharded dataset switches to exact results.
+        result_key = self._result_key(name)
+        memo_key = (result_key, self._version)
+        if memo_key in self._results:
+            return self._results[memo_key]
+
+        value = None
+        persist = self._can_persist_results()
+        if persist:
+            value = read_cached_result(self.filepath, result_key)
+        if value is None:
+            value = compute()
+            if persist:
+                fingerprint = file_fingerprint(self.filepath)
+                if (fingerprint['size'], fingerprint['mtime_ns']) == self._source_stat:
+                    write_cached_result(self.filepath, result_key, value,
+                                        fingerprint)
+
+        self._results[memo_key] = value
+        return value
+
+    def _compute_quality(self):
+        stats = self._statistics()
+        missing = stats.missing_counts()
+        return {
+            'rows': int(stats.rows),
+            'total_cells': int(stats.rows * len(missing)),
+            'missing': {column: int(count) for column, count in missing.items()},
+            'quality': float(stats.data_quality()),
+        }
+
+    def _summary_of(self, stats, rows=None):
+        # describe()-style table from an accumulator. Quartiles come from
+        # its sketch unless the rows are in memory to compute them exactly.
+        summary = stats.summary()
+        if not self._uses_shard_stats():
+            if rows is None:
+                rows = self.df
+            summary.loc[['25%', '50%', '75%']] = rows[summary.columns].quantile(
+                [0.25, 0.5, 0.75]).to_numpy()
+        return summary
+
+    def _compute_summary(self):
+        return self._summary_of(self._statistics()).to_dict(orient='split')
+
+    def _compute_outcome_summaries(self):
+        stats = self._statistics()
+        return [
+            [key, self._summary_of(
+                class_stats,
+                None if self._uses_shard_stats()
+                else self.df[self.df[CLASS_COLUMN] == key],
+            ).to_dict(orient='split')]
+            for key, class_stats in sorted(stats.by_class.items())
+        ]
 
     def get_record_count(self):
+        if self._stats is not None:
+            return self._stats.rows
+        if self.is_sharded and not self.is_loaded:
+            if self.streaming and self.filters:
+                return self._statistics().rows
+            return int(sum(self._map_shards(_count_shard)))
+        if self.filters:
+            # Filtered counts need the values
+            if self.streaming:
+                return self._statistics().rows
+            return len(self.df)
+        if not self.is_loaded:
+            return _count_data_lines(self.filepath)
         return len(self.df)
 
     def get_feature_count(self):
-        return len(self.df.columns)
+        return len(self.get_columns())
+
+    def get_columns(self):
+        if not self.is_loaded:
+            if self.columns is not None:
+                return list(self.columns)
+            return _read_header(self.shards[0])
+        return list(self.df.columns)
+
+    def get_dtypes(self):
+        # Exact once loaded. Before that the sidecar's schema is used when
+        # it is valid, otherwise dtypes are inferred from the first rows.
+        if self.is_loaded:
+            return self.df.dtypes
+
+        dtypes = None
+        if self.use_cache and not self._refresh_pending:
+            dtypes = read_cached_dtypes(self.shards[0], self._cache_variant)
+        if dtypes is None:
+            dtypes = self._read_head(DTYPE_SAMPLE_ROWS).dtypes
+        if self.columns is not None:
+            dtypes = dtypes[self.columns]
+        return dtypes
+
+    def _read_head(self, rows):
+        # First rows of the (filtered) source without loading the rest
+        if self.filters or self.is_sharded:
+            head, found = [], 0
+            for chunk in self.iter_chunks():
+                head.append(chunk.head(rows - found))
+                found += len(head[-1])
+                if found >= rows:
+                    break
+            if head:
+                return pd.concat(head, ignore_index=True)
+
+        head = pd.read_csv(self.shards[0], nrows=rows, usecols=self._usecols())
+        if self.filters:
+            head = head[_filter_mask(head, self.filters)]
+        return self._project(_apply_dtype_plan(head, self.dtype_plan))
+
+    def memory_report(self):
+        # Memory per column with the current dtypes ("after") next to what
+        # read_csv's default int64/float64 columns take ("before")
+        usage = self.df.memory_usage(index=False, deep=True)
+        before_dtypes = [
+            _inferred_dtype(self.dtype_plan[column])
+            if column in self.dtype_plan else self.df[column].dtype
+            for column in self.df.columns
+        ]
+        report = pd.DataFrame({
+            'dtype_before': before_dtypes,
+            'bytes_before': [
+                dtype.itemsize * len(self.df)
+                if column in self.dtype_plan else usage[column]
+                for column, dtype in zip(self.df.columns, before_dtypes)
+            ],
+            'dtype_after': self.df.dtypes,
+            'bytes_after': usage,
+        }, index=self.df.columns)
+        report.loc['Total'] = [
+            '', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+        return report
 
     def get_data_quality(self):
-        missing = self.df.isnull().sum().sum()
-        total = len(self.df) * len(self.df.columns)
-        quality = (1 - missing / total) * 100
-        return round(quality, 1)
+        return self._cached_result('quality', self._compute_quality)['quality']
+
+    def get_missing_counts(self):
+        # Missing values per column, from the same cached pass as
+        # get_data_quality; the zero-as-missing columns come from the
+        # bitmap's histogram when it has been built
+        missing = self._cached_result('quality', self._compute_quality)['missing']
+        missing = pd.Series(missing, dtype='int64')
+        if self._bitmap is not None:
+            counts = self._bitmap.missing_counts()
+            missing[counts.index] = counts
+        return missing
+
+    def get_complete_count(self):
+        # Rows with none of the zero-as-missing columns missing
+        return self._missing_bitmap().complete_count()
+
+    def get_complete_cases(self):
+        # The complete rows themselves (needs the rows in memory)
+        df = self.df
+        return df[self._missing_bitmap().complete_mask()]
+
+    def get_missing_patterns(self):
+        # Rows per combination of missing zero-as-missing columns, most
+        # common first (the Phase 2 notebook's missing-pattern heatmap)
+        return self._missing_bitmap().pattern_table()
 
     def get_preview(self, rows=10):
+        if self.streaming:
+            return self._read_head(rows)
         return self.df.head(rows)
 
     def get_summary(self):
-        return self.df.describe()
+        summary = self._cached_result('summary', self._compute_summary)
+        return pd.DataFrame(**summary)
+
+    def get_percentiles(self, percentiles=REFERENCE_PERCENTILES, outcome=None):
+        # Percentiles of each numeric column (columns p10, p25, ...) over all
+        # rows or one Outcome class; outcome=0 is the healthy baseline used
+        # in the reference data. Exact while the rows are in memory. For
+        # streaming or sharded data they come from the KLL sketches in the
+        # same single pass as the other statistics, within
+        # KLLSketch.rank_error() in rank (about 0.3%).
+        stats = self._statistics()
+        if outcome is not None:
+            if outcome not in stats.by_class:
+                raise ValueError(f"No rows with {CLASS_COLUMN} == {outcome}")
+            stats = stats.by_class[outcome]
+
+        quantiles = np.asarray(percentiles, dtype='float64') / 100
+        if self._uses_shard_stats():
+            values = np.array([sketch.quantile(quantiles)
+                               for sketch in stats.sketches])
+        else:
+            rows = self.df
+            if outcome is not None:
+                rows = rows[rows[CLASS_COLUMN] == outcome]
+            values = rows[stats.numeric_columns].quantile(quantiles).to_numpy().T
+
+        return pd.DataFrame(values, index=stats.numeric_columns,
+                            columns=[f'p{p:g}' for p in percentiles])
+
+    def get_summary_by_outcome(self):
+        # get_summary() for each Outcome class, e.g. {0: healthy, 1: diabetic}
+        summaries = self._cached_result('outcome_summary',
+                                        self._compute_outcome_summaries)
+        return {key: pd.DataFrame(**summary) for key, summary in summaries}
+
+    def get_imputer(self, method='median', columns=IMPUTE_COLUMNS,
+                    k=DEFAULT_NEIGHBOURS):
+        # A fitted imputer for these rows (see imputation.py). Medians are
+        # exact in memory and come from the KLL sketches otherwise; KNN
+        # donors are taken from the rows, or collected in one walk over
+        # the chunks when streaming
+        if method not in IMPUTE_METHODS:
+            raise ValueError(
+                f"method must be one of {IMPUTE_METHODS}, got {method!r}")
+        if method == 'median':
+            if self._uses_shard_stats():
+                return MedianImputer.from_stats(self._statistics(), columns)
+            return MedianImputer.from_frame(self.df, columns)
+        chunks = self.iter_chunks() if self.streaming else [self.df]
+        return KNNImputer(k=k, columns=columns).fit(chunks)
+
+    def impute(self, method='median', columns=IMPUTE_COLUMNS,
+               k=DEFAULT_NEIGHBOURS):
+        # Copy of the rows with missing values filled in; the dataset
+        # itself keeps its missing values
+        return self.get_imputer(method, columns, k).transform(self.df)
+
+    def iter_imputed_chunks(self, method='median', columns=IMPUTE_COLUMNS,
+                            k=DEFAULT_NEIGHBOURS):
+        # iter_chunks() with missing values filled in, one chunk at a time,
+        # for data too big to load
+        imputer = self.get_imputer(method, columns, k)
+        return impute_chunks(self.iter_chunks(), imputer)
@@ -23,6 +23,18 @@ VALID_RANGES = {
     'age': (21, 81)                # Age in years (dataset was women 21+)
 }
 
+# Column names used for each field in the dataset CSVs
+FEATURE_COLUMNS = {
+    'pregnancies': 'Pregnancies',
+    'glucose': 'Glucose',
+    'blood_pressure': 'BloodPressure',
+    'skin_thickness': 'SkinThickness',
+    'insulin': 'Insulin',
+    'bmi': 'BMI',
+    'diabetes_pedigree': 'DiabetesPedigreeFunction',
+    'age': 'Age'
+}
+
 # ============================================================
 # THE HEALTHPROFILE CLASS
 # ============================================================
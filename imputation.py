@@ -0,0 +1,266 @@
+# Imputation of missing measurements for DiabetesDataset.
+#
+# After cleaning about half of Insulin and a third of SkinThickness are
+# missing. Two imputers fill them in, both fitted once and then applied
+# chunk by chunk, so data larger than memory can be imputed while it
+# streams past:
+#
+#   MedianImputer - the column's median among rows with the same Outcome
+#   KNNImputer    - the mean of the k most similar complete rows, found
+#                   with a KD-tree (scipy.spatial.cKDTree) instead of
+#                   computing all pairwise distances
+
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from dataset_stats import CLASS_COLUMN, StatsAccumulator
+
+
+# Columns imputed by default
+IMPUTE_COLUMNS = ['Insulin', 'SkinThickness']
+
+# Features used to measure how similar two rows are for KNN imputation
+KNN_FEATURES = ['Pregnancies', 'Glucose', 'BloodPressure', 'BMI',
+                'DiabetesPedigreeFunction', 'Age']
+
+DEFAULT_NEIGHBOURS = 5
+
+# KNN keeps at most this many donor rows (a uniform sample beyond it)
+DEFAULT_MAX_DONORS = 250_000
+
+IMPUTE_METHODS = ('median', 'knn')
+
+
+def _fill(chunk: pd.DataFrame, column: str, missing: np.ndarray,
+          values: np.ndarray) -> None:
+    # Write imputed values into the missing cells of one column, rounding
+    # them if the column holds integers
+    filled = chunk[column].to_numpy(dtype='float64', na_value=np.nan)
+    filled[missing] = values
+    dtype = chunk[column].dtype
+    if pd.api.types.is_integer_dtype(dtype):
+        chunk[column] = pd.Series(np.round(filled), index=chunk.index).astype(dtype)
+    else:
+        chunk[column] = filled.astype(dtype, copy=False)
+
+
+# ============================================================
+# MEDIAN BY OUTCOME
+# ============================================================
+
+class MedianImputer:
+    """
+    Fill each missing value with the median of its column among rows
+    with the same Outcome.
+
+    Rows with no (or an unseen) Outcome get the overall median.
+
+    Example:
+        imputer = MedianImputer.from_frame(df)
+        imputed = imputer.transform(df)
+    """
+
+    def __init__(self, medians: Dict[object, Dict[str, float]],
+                 overall: Dict[str, float]):
+        self.medians = medians
+        self.overall = overall
+        self.columns: List[str] = list(overall)
+        self.filled: Dict[str, int] = {column: 0 for column in self.columns}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame,
+                   columns: Sequence[str] = IMPUTE_COLUMNS) -> 'MedianImputer':
+        """Exact medians from rows in memory."""
+        columns = [column for column in columns if column in df.columns]
+        overall = {column: float(df[column].median()) for column in columns}
+        medians = {}
+        if CLASS_COLUMN in df.columns:
+            grouped = df.groupby(CLASS_COLUMN)[columns].median()
+            medians = {
+                (key.item() if hasattr(key, 'item') else key):
+                    {column: float(value) for column, value in row.items()}
+                for key, row in grouped.iterrows()
+            }
+        return cls(medians, overall)
+
+    @classmethod
+    def from_stats(cls, stats: StatsAccumulator,
+                   columns: Sequence[str] = IMPUTE_COLUMNS) -> 'MedianImputer':
+        """
+        Medians from a StatsAccumulator's quantile sketches, for data that
+        was only ever seen in chunks (exact up to the sketch size).
+        """
+        def medians_of(accumulator):
+            return {
+                column: float(accumulator.sketches[
+                    accumulator.numeric_columns.index(column)].quantile(0.5))
+                for column in columns
+            }
+
+        columns = [column for column in columns
+                   if column in stats.numeric_columns]
+        return cls({key: medians_of(class_stats)
+                    for key, class_stats in stats.by_class.items()},
+                   medians_of(stats))
+
+    def transform(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Return a copy of chunk with the missing values filled."""
+        chunk = chunk.copy()
+        if CLASS_COLUMN in chunk.columns:
+            classes = chunk[CLASS_COLUMN].to_numpy(dtype='float64',
+                                                   na_value=np.nan)
+        else:
+            classes = np.full(len(chunk), np.nan)
+
+        for column in self.columns:
+            if column not in chunk.columns:
+                continue
+            missing = chunk[column].isnull().to_numpy()
+            if not missing.any():
+                continue
+
+            # Look up each missing row's class median, overall by default
+            values = np.full(missing.sum(), self.overall[column])
+            missing_classes = classes[missing]
+            for key, medians in self.medians.items():
+                values[missing_classes == key] = medians[column]
+            _fill(chunk, column, missing, values)
+            self.filled[column] += int(missing.sum())
+        return chunk
+
+
+# ============================================================
+# K NEAREST NEIGHBOURS
+# ============================================================
+
+class KNNImputer:
+    """
+    Fill each missing value with the mean of that column over the k
+    nearest donor rows.
+
+    Donors for a column are rows where it and every feature are present.
+    Features are standardised with the donors' mean and standard
+    deviation so no feature dominates the distance, and a KD-tree per
+    imputed column answers all of a chunk's neighbour queries in one
+    vectorised call, in O(log n) per row. Missing features of a row
+    being imputed are filled with the donors' median first.
+
+    Example:
+        imputer = KNNImputer(k=5).fit([df])
+        for chunk in chunks:
+            imputed = imputer.transform(chunk)
+    """
+
+    def __init__(self, k: int = DEFAULT_NEIGHBOURS,
+                 columns: Sequence[str] = IMPUTE_COLUMNS,
+                 features: Sequence[str] = KNN_FEATURES,
+                 max_donors: int = DEFAULT_MAX_DONORS, seed: int = 0):
+        self.k = k
+        self.columns = list(columns)
+        self.features = list(features)
+        self.max_donors = max_donors
+        self.seed = seed
+        self.filled: Dict[str, int] = {column: 0 for column in self.columns}
+
+        self._trees: Dict[str, cKDTree] = {}
+        self._targets: Dict[str, np.ndarray] = {}
+        self._centre: Dict[str, np.ndarray] = {}
+        self._scale: Dict[str, np.ndarray] = {}
+        self._feature_fill: Dict[str, np.ndarray] = {}
+
+    def fit(self, chunks: Iterable[pd.DataFrame]) -> 'KNNImputer':
+        """
+        Collect donor rows from chunks and build a KD-tree per column.
+
+        Donors beyond max_donors are sampled uniformly (each row gets a
+        random priority and the highest priorities are kept), so fitting
+        on data larger than memory needs only max_donors rows at a time.
+
+        Args:
+            chunks: DataFrames, e.g. [df] or DiabetesDataset.iter_chunks()
+
+        Returns:
+            self
+        """
+        rng = np.random.default_rng(self.seed)
+        donors = {column: (np.empty((0, len(self.features) + 1)),
+                           np.empty(0)) for column in self.columns}
+
+        for chunk in chunks:
+            features = chunk[self.features].to_numpy(dtype='float64',
+                                                     na_value=np.nan)
+            complete = ~np.isnan(features).any(axis=1)
+            for column in self.columns:
+                target = chunk[column].to_numpy(dtype='float64',
+                                                na_value=np.nan)
+                keep = complete & ~np.isnan(target)
+                rows = np.column_stack([features[keep], target[keep]])
+                kept, priority = donors[column]
+                rows = np.concatenate([kept, rows])
+                priority = np.concatenate(
+                    [priority, rng.random(int(keep.sum()))])
+                if len(rows) > self.max_donors:
+                    top = np.argpartition(-priority, self.max_donors)
+                    top = top[:self.max_donors]
+                    rows, priority = rows[top], priority[top]
+                donors[column] = (rows, priority)
+
+        for column, (rows, _) in donors.items():
+            if len(rows) == 0:
+                raise ValueError(f"No complete donor rows for {column}")
+            features, target = rows[:, :-1], rows[:, -1]
+            scale = features.std(axis=0)
+            scale[scale == 0] = 1.0
+            self._centre[column] = features.mean(axis=0)
+            self._scale[column] = scale
+            self._feature_fill[column] = np.median(features, axis=0)
+            self._targets[column] = target
+            self._trees[column] = cKDTree(
+                (features - self._centre[column]) / scale)
+        return self
+
+    def transform(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Return a copy of chunk with the missing values filled."""
+        if not self._trees:
+            raise ValueError("KNNImputer must be fitted before transform")
+
+        chunk = chunk.copy()
+        features = chunk[self.features].to_numpy(dtype='float64',
+                                                 na_value=np.nan)
+        for column in self.columns:
+            missing = chunk[column].isnull().to_numpy()
+            if not missing.any():
+                continue
+
+            query = features[missing]
+            gaps = np.isnan(query)
+            query[gaps] = np.broadcast_to(self._feature_fill[column],
+                                          query.shape)[gaps]
+            query = (query - self._centre[column]) / self._scale[column]
+
+            k = min(self.k, len(self._targets[column]))
+            _, neighbours = self._trees[column].query(query, k=k, workers=-1)
+            neighbours = neighbours.reshape(len(query), k)
+            _fill(chunk, column, missing,
+                  self._targets[column][neighbours].mean(axis=1))
+            self.filled[column] += int(missing.sum())
+        return chunk
+
+
+# ============================================================
+# CHUNKED APPLICATION
+# ============================================================
+
+def impute_chunks(chunks: Iterable[pd.DataFrame],
+                  imputer) -> Iterator[pd.DataFrame]:
+    """
+    Apply a fitted imputer to each chunk as it arrives.
+
+    Only one chunk is held at a time, so this works on files larger than
+    memory, e.g. impute_chunks(dataset.iter_chunks(), imputer).
+    """
+    for chunk in chunks:
+        yield imputer.transform(chunk)
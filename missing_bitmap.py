@@ -0,0 +1,128 @@
+# Packed per-row missingness index for DiabetesDataset.
+#
+# Each row gets one byte whose bits say which of up to eight nullable
+# columns are missing in it (bit 0 = first column). The byte is built
+# once from an isnull() pass when the rows are loaded; after that,
+# complete cases, per-column missing counts and the missing-pattern table
+# are bit operations on a uint8 array and a 256-entry histogram of it,
+# with no further scans of the data.
+#
+# Data that is streamed rather than loaded uses a histogram-only bitmap
+# (keep_rows=False): the per-row bytes are counted and dropped, so memory
+# stays at 256 counters however large the file. Everything but
+# complete_mask() still works.
+
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+MAX_BITMAP_COLUMNS = 8
+
+
+class MissingBitmap:
+    """
+    One byte per row recording which nullable columns are missing.
+
+    The pattern histogram (how many rows have each byte value) is kept up
+    to date as rows are added, so counts are answered from at most 256
+    entries instead of the rows.
+
+    Example:
+        bitmap = MissingBitmap.from_frame(df, ['Glucose', 'Insulin'])
+        bitmap.complete_count()        # rows with neither missing
+        df[bitmap.complete_mask()]     # complete-case rows
+        bitmap.pattern_table()         # rows per missing pattern
+        bitmap.missing_counts()        # missing values per column
+
+        # Counts only, for data streamed in chunks
+        bitmap = MissingBitmap(['Glucose', 'Insulin'], keep_rows=False)
+        for chunk in chunks:
+            bitmap.extend(chunk)
+    """
+
+    def __init__(self, columns: Sequence[str], keep_rows: bool = True):
+        """
+        Args:
+            columns: Nullable columns to track, at most MAX_BITMAP_COLUMNS
+            keep_rows: Keep each row's byte (needed for complete_mask());
+                False keeps only the pattern histogram
+        """
+        if len(columns) > MAX_BITMAP_COLUMNS:
+            raise ValueError(
+                f"A bitmap covers at most {MAX_BITMAP_COLUMNS} columns")
+        self.columns: List[str] = list(columns)
+        self.keep_rows = keep_rows
+        self.rows = 0
+        self.bits = np.zeros(0, dtype=np.uint8)
+        self._frequencies = np.zeros(1 << len(self.columns), dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame,
+                   columns: Sequence[str]) -> 'MissingBitmap':
+        """Build the bitmap for the given columns that df has."""
+        bitmap = cls([column for column in columns if column in df.columns])
+        bitmap.extend(df)
+        return bitmap
+
+    def extend(self, df: pd.DataFrame) -> None:
+        """Add bitmap entries for more rows (e.g. appended records)."""
+        if not self.columns:
+            new = np.zeros(len(df), dtype=np.uint8)
+        else:
+            mask = df[self.columns].isnull().to_numpy()
+            new = np.packbits(mask, axis=1, bitorder='little').ravel()
+        if self.keep_rows:
+            self.bits = np.concatenate([self.bits, new])
+        self.rows += len(new)
+        self._frequencies += np.bincount(
+            new, minlength=len(self._frequencies))
+
+    def __len__(self) -> int:
+        return self.rows
+
+    # ============================================================
+    # QUERIES
+    # ============================================================
+
+    def complete_mask(self) -> np.ndarray:
+        """Boolean mask of rows with none of the columns missing."""
+        if not self.keep_rows:
+            raise ValueError(
+                "A histogram-only bitmap (keep_rows=False) has no per-row mask")
+        return self.bits == 0
+
+    def complete_count(self) -> int:
+        return int(self._frequencies[0])
+
+    def missing_counts(self) -> pd.Series:
+        """Missing values per column, like df[columns].isnull().sum()."""
+        patterns = np.arange(len(self._frequencies))
+        counts = [
+            self._frequencies[(patterns >> i) & 1 == 1].sum()
+            for i in range(len(self.columns))
+        ]
+        return pd.Series(counts, index=self.columns, dtype='int64')
+
+    def pattern_table(self) -> pd.DataFrame:
+        """
+        Every missing pattern that occurs, most common first.
+
+        Returns:
+            DataFrame with one bool column per bitmap column (True =
+            missing), then the pattern's row count and percentage
+        """
+        patterns = np.flatnonzero(self._frequencies)
+        counts = self._frequencies[patterns]
+        order = np.lexsort((patterns, -counts))
+        patterns, counts = patterns[order], counts[order]
+
+        table = pd.DataFrame({
+            column: (patterns >> i) & 1 == 1
+            for i, column in enumerate(self.columns)
+        })
+        table['count'] = counts
+        total = max(self.rows, 1)
+        table['percent'] = (counts / total * 100).round(1)
+        return table
@@ -0,0 +1,251 @@
+# Builds reference/diabetes_reference_data.json from the cleaned data.
+#
+# This replaces the export at the end of the Phase 3 notebook. For every
+# feature the reference file holds the healthy and diabetic groups' mean
+# and standard deviation, plus the healthy group's p10-p90 percentiles,
+# min and max.
+#
+# The rows are split by Outcome once, and every feature is then
+# summarised in its own thread from that single split (numpy releases the
+# GIL while it partitions values for the percentiles). Sharded data can
+# instead be summarised approximately: each shard is reduced to mergeable
+# statistics on a process pool and only those are combined.
+#
+# Usage:
+#     python reference_builder.py
+#     python reference_builder.py data/shards/ out.json --approximate
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from atomic_file import write_atomic
+from data_cleaning import CLEANED_PATH
+from dataset_stats import CLASS_COLUMN
+from diabetes_dataset import REFERENCE_PERCENTILES, DiabetesDataset
+from health_profile import FEATURE_COLUMNS
+
+
+REFERENCE_PATH = './reference/diabetes_reference_data.json'
+
+# Features in the reference file, in file order
+REFERENCE_FEATURES = list(FEATURE_COLUMNS.values())
+
+HEALTHY, DIABETIC = 0, 1
+
+# Strata the reference values are also computed for, so a patient can be
+# compared with people like them. Each stratification is (column, integer
+# lower bounds of every stratum after the first, stratum labels).
+STRATIFICATIONS = {
+    'age': ('Age', (30, 40, 50, 60),
+            ('<30', '30-39', '40-49', '50-59', '60+')),
+    'pregnancies': ('Pregnancies', (1, 3, 6),
+                    ('0', '1-2', '3-5', '6+')),
+}
+
+
+# ============================================================
+# COMPUTING THE REFERENCE VALUES
+# ============================================================
+
+def _feature_reference(values: np.ndarray, healthy: np.ndarray,
+                       diabetic: np.ndarray) -> Dict[str, float]:
+    # All reference fields for one feature, with the notebook's pandas
+    # semantics: NaN dropped, sample std (ddof=1), linear quantiles
+    healthy_values = values[healthy]
+    healthy_values = healthy_values[~np.isnan(healthy_values)]
+    diabetic_values = values[diabetic]
+    diabetic_values = diabetic_values[~np.isnan(diabetic_values)]
+
+    def mean_std(group):
+        if len(group) == 0:
+            return float('nan'), float('nan')
+        std = group.std(ddof=1) if len(group) > 1 else float('nan')
+        return float(group.mean()), float(std)
+
+    reference = {}
+    reference['healthy_mean'], reference['healthy_std'] = mean_std(healthy_values)
+    reference['diabetic_mean'], reference['diabetic_std'] = mean_std(diabetic_values)
+
+    if len(healthy_values):
+        percentiles = np.percentile(healthy_values, REFERENCE_PERCENTILES)
+        low, high = healthy_values.min(), healthy_values.max()
+    else:
+        percentiles = np.full(len(REFERENCE_PERCENTILES), np.nan)
+        low = high = np.nan
+    for p, value in zip(REFERENCE_PERCENTILES, percentiles):
+        reference[f'p{p}'] = float(value)
+    reference['min'] = float(low)
+    reference['max'] = float(high)
+    return reference
+
+
+def compute_reference(df: pd.DataFrame,
+                      features: Sequence[str] = REFERENCE_FEATURES,
+                      workers: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Compute the reference values of every feature from rows in memory.
+
+    Args:
+        df: Cleaned rows with an Outcome column
+        features: Features to include, in output order
+        workers: Threads to spread the features over (default: one per CPU)
+
+    Returns:
+        Dictionary of feature -> reference fields, shaped like
+        diabetes_reference_data.json
+    """
+    outcome = df[CLASS_COLUMN].to_numpy()
+    healthy = outcome == HEALTHY
+    diabetic = outcome == DIABETIC
+
+    def build(feature):
+        values = df[feature].to_numpy(dtype='float64', na_value=np.nan)
+        return _feature_reference(values, healthy, diabetic)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(features, pool.map(build, features)))
+
+
+def stratum_codes(values: np.ndarray, bounds: Sequence[int]) -> np.ndarray:
+    """
+    Stratum number of each value (-1 for NaN), from the integer lower
+    bounds of a stratification: values below bounds[0] are stratum 0,
+    values from bounds[0] up to bounds[1] stratum 1, and so on.
+    """
+    codes = np.searchsorted(np.asarray(bounds), np.floor(values), side='right')
+    return np.where(np.isnan(values), -1, codes)
+
+
+def compute_stratified_reference(
+        df: pd.DataFrame, features: Sequence[str] = REFERENCE_FEATURES,
+        workers: Optional[int] = None
+) -> Dict[str, Dict[str, Dict[str, Dict[str, float]]]]:
+    """
+    compute_reference() within every stratum of every stratification.
+
+    Returns:
+        stratification -> stratum label -> feature -> reference fields
+    """
+    stratified = {}
+    for name, (column, bounds, labels) in STRATIFICATIONS.items():
+        codes = stratum_codes(
+            df[column].to_numpy(dtype='float64', na_value=np.nan), bounds)
+        stratified[name] = {
+            label: compute_reference(df[codes == code], features, workers)
+            for code, label in enumerate(labels)
+        }
+    return stratified
+
+
+def approximate_reference(dataset: DiabetesDataset,
+                          features: Sequence[str] = REFERENCE_FEATURES
+                          ) -> Dict[str, Dict[str, float]]:
+    """
+    Reference values from a dataset's mergeable statistics.
+
+    Works without loading the rows (e.g. a streaming or sharded dataset,
+    whose shards are summarised in parallel). Means, standard deviations,
+    min and max are exact; percentiles come from KLL sketches and are
+    within KLLSketch.rank_error() in rank.
+    """
+    summaries = dataset.get_summary_by_outcome()
+    percentiles = dataset.get_percentiles(REFERENCE_PERCENTILES,
+                                          outcome=HEALTHY)
+    healthy, diabetic = summaries[HEALTHY], summaries[DIABETIC]
+
+    reference = {}
+    for feature in features:
+        reference[feature] = {
+            'healthy_mean': float(healthy.loc['mean', feature]),
+            'healthy_std': float(healthy.loc['std', feature]),
+            'diabetic_mean': float(diabetic.loc['mean', feature]),
+            'diabetic_std': float(diabetic.loc['std', feature]),
+            **{column: float(value)
+               for column, value in percentiles.loc[feature].items()},
+            'min': float(healthy.loc['min', feature]),
+            'max': float(healthy.loc['max', feature]),
+        }
+    return reference
+
+
+# ============================================================
+# WRITING THE FILE
+# ============================================================
+
+def write_reference(reference: Dict[str, Dict[str, float]],
+                    output_path: str = REFERENCE_PATH) -> None:
+    """
+    Write the reference JSON (indented like the notebook's export).
+
+    The file is written to a temporary name and renamed into place, so
+    the app never reads a half-written reference file.
+    """
+    def dump(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(reference, f, indent=2)
+
+    write_atomic(output_path, dump)
+
+
+def build_reference(source: str = CLEANED_PATH,
+                    output_path: str = REFERENCE_PATH,
+                    approximate: bool = False,
+                    workers: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Build and write the reference file for a cleaned CSV, directory of
+    CSV shards or glob pattern.
+
+    Args:
+        source: Cleaned data (see DiabetesDataset for the forms accepted)
+        output_path: Where to write the JSON
+        approximate: Summarise shards in parallel without loading the
+            rows; percentiles become sketch estimates
+        workers: Threads (exact) or processes (approximate) to use
+
+    Returns:
+        The reference values that were written
+    """
+    features = REFERENCE_FEATURES
+    if approximate:
+        dataset = DiabetesDataset(source, streaming=True, workers=workers)
+        reference = approximate_reference(dataset, features)
+    else:
+        dataset = DiabetesDataset(source, engine='pyarrow',
+                                  columns=features + [CLASS_COLUMN],
+                                  workers=workers)
+        reference = compute_reference(dataset.df, features, workers)
+    write_reference(reference, output_path)
+    return reference
+
+
+# ============================================================
+# COMMAND LINE
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Build the healthy/diabetic reference statistics file')
+    parser.add_argument('source', nargs='?', default=CLEANED_PATH,
+                        help='cleaned CSV, directory of shards or glob')
+    parser.add_argument('output_path', nargs='?', default=REFERENCE_PATH)
+    parser.add_argument('--approximate', action='store_true',
+                        help='use mergeable per-shard statistics and '
+                             'sketch percentiles instead of loading the rows')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reference = build_reference(args.source, args.output_path,
+                                args.approximate, args.workers)
+    print(f"Wrote {len(reference)} features to {args.output_path} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
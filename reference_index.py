@@ -0,0 +1,451 @@
+# Sorted per-feature reference values for fast percentile ranks.
+#
+# The Phase 3 notebook's calculate_percentile_rank copies a reference
+# column, drops NaNs and counts the values <= the query on every call,
+# which is O(n) per lookup. ReferenceIndex does that work once: for each
+# reference group (healthy, diabetic, all patients), overall and within
+# each age band and pregnancy-count bucket, it keeps every feature's
+# observed values sorted, so a percentile rank is one binary search,
+# O(log n), with the same "<=" semantics (searchsorted side='right').
+#
+# The index is saved as one uncompressed Arrow IPC file: a single flat
+# column holding every group's sorted values, with the offsets table and
+# the summary fields of diabetes_reference_data.json in its schema
+# metadata. Loading memory-maps the file, so values are only paged in as
+# lookups touch them and every process on a host that opens the file
+# shares one physical copy through the OS page cache. The JSON file is
+# still written alongside it for people to read.
+#
+# Usage:
+#     python reference_index.py
+#     python reference_index.py data/shards/ reference/reference.arrow
+
+import argparse
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from atomic_file import write_atomic
+from data_cleaning import CLEANED_PATH
+from dataset_stats import CLASS_COLUMN
+from diabetes_dataset import DiabetesDataset
+from reference_builder import (DIABETIC, HEALTHY, REFERENCE_FEATURES,
+                               REFERENCE_PATH, STRATIFICATIONS,
+                               compute_reference,
+                               compute_stratified_reference, stratum_codes,
+                               write_reference)
+
+
+INDEX_PATH = './reference/diabetes_reference.arrow'
+
+# Schema metadata keys of the index file
+_METADATA_PREFIX = b'reference_index.'
+
+# Read the index in 1 MiB blocks when hashing it
+_HASH_BLOCK_SIZE = 1 << 20
+
+# Reference groups and the Outcome value selecting each (None = every row)
+REFERENCE_GROUPS = {
+    'healthy': HEALTHY,
+    'diabetic': DIABETIC,
+    'all': None,
+}
+
+
+def table_key(group: str, stratification: Optional[str] = None,
+              stratum: Optional[str] = None) -> str:
+    """Name of one table of sorted values, e.g. 'healthy/age=40-49'."""
+    if stratification is None:
+        return group
+    return f'{group}/{stratification}={stratum}'
+
+
+def index_digest(path: str = INDEX_PATH) -> str:
+    """
+    Short content hash of a saved index file: the first 12 hex digits of
+    its SHA-256. Snapshot versions end in it (see reference_store.py), and
+    files derived from an index record it to say which one they came from.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ReferenceIndex:
+    """
+    Sorted observed values of each feature for each reference group,
+    overall and within each stratum of STRATIFICATIONS (age band,
+    pregnancy count).
+
+    Every (group, stratum) combination is one table of per-feature sorted
+    arrays, all stored in one flat values array. Picking a patient's
+    stratum is O(1): integer bounds are turned into a lookup list once,
+    so the stratum is a list index, and the table is a dict access.
+
+    Example:
+        index = ReferenceIndex.from_frame(df)
+        index.save('reference/diabetes_reference.arrow')
+
+        index = ReferenceIndex.load('reference/diabetes_reference.arrow')
+        index.summary['BMI']['p75']                    # JSON fields
+        index.percentile_rank('BMI', 32)               # vs healthy patients
+        index.percentile_rank('BMI', 32, 'diabetic')
+        index.percentile_rank('BMI', 32, stratum=('age', '40-49'))
+        index.score({'Glucose': 140, 'BMI': 34.5, 'Age': 45},
+                    stratify_by='age')                 # vs healthy 40-49s
+    """
+
+    def __init__(self, values: np.ndarray, offsets: np.ndarray,
+                 tables: Sequence[str], features: Sequence[str],
+                 summary: Optional[Dict[str, Dict[str, float]]] = None,
+                 stratifications: Optional[Dict[str, tuple]] = None,
+                 strata_summary: Optional[Dict[str, Dict]] = None):
+        """
+        Args:
+            values: Every table's sorted values, one feature after another
+            offsets: (tables, features + 1) array; table t's values for
+                feature f are values[offsets[t, f]:offsets[t, f + 1]]
+            tables: Table names (see table_key), in offsets row order
+            features: Feature names, in offsets column order
+            summary: The diabetes_reference_data.json fields per feature
+            stratifications: The STRATIFICATIONS the tables were built with
+            strata_summary: Summary fields per stratification and stratum
+        """
+        self.values = values
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.tables = list(tables)
+        self.features = list(features)
+        self.summary = summary or {}
+        self.stratifications = {
+            name: (column, tuple(bounds), tuple(labels))
+            for name, (column, bounds, labels)
+            in (stratifications or {}).items()
+        }
+        self.strata_summary = strata_summary or {}
+        self.groups = [table for table in self.tables if '/' not in table]
+
+        # One view per (table, feature), so a lookup is a dict access and
+        # a binary search
+        self._sorted: Dict[str, Dict[str, np.ndarray]] = {
+            table: {
+                feature: values[self.offsets[t, f]:self.offsets[t, f + 1]]
+                for f, feature in enumerate(self.features)
+            }
+            for t, table in enumerate(self.tables)
+        }
+
+        # Stratum label for every integer value up to the last bound
+        self._stratum_lookup: Dict[str, List[str]] = {
+            name: [labels[code] for code in
+                   stratum_codes(np.arange(bounds[-1] + 1.0), bounds)]
+            for name, (_, bounds, labels) in self.stratifications.items()
+        }
+
+    # ============================================================
+    # BUILDING AND SAVING
+    # ============================================================
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame,
+                   features: Sequence[str] = REFERENCE_FEATURES
+                   ) -> 'ReferenceIndex':
+        """
+        Build the index, and its summary fields, from cleaned rows with an
+        Outcome column.
+        """
+        outcome = df[CLASS_COLUMN].to_numpy(dtype='float64', na_value=np.nan)
+        columns = {feature: df[feature].to_numpy(dtype='float64',
+                                                 na_value=np.nan)
+                   for feature in features}
+
+        # Rows of every table: each group overall, then within each stratum
+        selections = {}
+        strata = {
+            name: stratum_codes(
+                df[column].to_numpy(dtype='float64', na_value=np.nan), bounds)
+            for name, (column, bounds, _) in STRATIFICATIONS.items()
+        }
+        for group, selector in REFERENCE_GROUPS.items():
+            rows = (np.ones(len(df), dtype=bool) if selector is None
+                    else outcome == selector)
+            selections[table_key(group)] = rows
+            for name, (_, _, labels) in STRATIFICATIONS.items():
+                for code, label in enumerate(labels):
+                    selections[table_key(group, name, label)] = (
+                        rows & (strata[name] == code))
+
+        pieces = []
+        offsets = np.zeros((len(selections), len(features) + 1),
+                           dtype=np.int64)
+        position = 0
+        for t, rows in enumerate(selections.values()):
+            offsets[t, 0] = position
+            for f, feature in enumerate(features):
+                values = columns[feature][rows]
+                values = np.sort(values[~np.isnan(values)])
+                pieces.append(values)
+                position += len(values)
+                offsets[t, f + 1] = position
+        values = np.concatenate(pieces) if pieces else np.empty(0)
+        return cls(values, offsets, list(selections), features,
+                   compute_reference(df, features), STRATIFICATIONS,
+                   compute_stratified_reference(df, features))
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        """
+        Write the index as an uncompressed Arrow IPC file, via a temporary
+        file renamed into place so readers never map a partial file.
+        """
+        metadata = {
+            'offsets': self.offsets.tolist(),
+            'tables': self.tables,
+            'features': self.features,
+            'summary': self.summary,
+            'stratifications': self.stratifications,
+            'strata_summary': self.strata_summary,
+        }
+        table = pa.table({'values': pa.array(self.values, type=pa.float64())})
+        table = table.replace_schema_metadata({
+            _METADATA_PREFIX + key.encode(): json.dumps(value).encode()
+            for key, value in metadata.items()
+        })
+
+        # Uncompressed so the values can be mapped without a copy
+        write_atomic(path, lambda tmp_path: feather.write_feather(
+            table, tmp_path, compression='uncompressed'))
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> 'ReferenceIndex':
+        """
+        Open a saved index without reading its values.
+
+        The values array is a read-only view of the memory-mapped file;
+        pages are read in on first use and shared with every other
+        process that maps the same file.
+        """
+        table = feather.read_table(path, memory_map=True)
+        metadata = {
+            key[len(_METADATA_PREFIX):].decode(): json.loads(value)
+            for key, value in (table.schema.metadata or {}).items()
+            if key.startswith(_METADATA_PREFIX)
+        }
+        column = table.column('values')
+        if column.num_chunks == 1:
+            values = column.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            values = column.to_numpy()
+        return cls(values, np.array(metadata['offsets'], dtype=np.int64),
+                   metadata['tables'], metadata['features'],
+                   metadata['summary'], metadata.get('stratifications'),
+                   metadata.get('strata_summary'))
+
+    # ============================================================
+    # STRATA
+    # ============================================================
+
+    def stratum(self, stratification: str, value: float) -> Optional[str]:
+        """
+        Label of the stratum value falls in, in O(1), e.g.
+        stratum('age', 45) -> '40-49'. None if value is None or NaN.
+        """
+        if value is None or value != value:
+            return None
+        labels = self._stratum_lookup[stratification]
+        return labels[min(max(int(value), 0), len(labels) - 1)]
+
+    def _table(self, group: str, stratum: Optional[Tuple[str, str]]):
+        # Sorted arrays of one table; stratum is (stratification, label)
+        if stratum is None:
+            return self._sorted[group]
+        return self._sorted[table_key(group, *stratum)]
+
+    def _stratum_column(self, stratify_by: str) -> str:
+        if stratify_by not in self.stratifications:
+            raise ValueError(
+                f"stratify_by must be one of {list(self.stratifications)}, "
+                f"got {stratify_by!r}")
+        return self.stratifications[stratify_by][0]
+
+    # ============================================================
+    # QUERIES
+    # ============================================================
+
+    def reference_values(self, feature: str, group: str = 'healthy',
+                         stratum: Optional[Tuple[str, str]] = None
+                         ) -> np.ndarray:
+        """The sorted observed values of feature in a group (read-only)."""
+        return self._table(group, stratum)[feature]
+
+    def percentile_rank(self, feature: str, value: float,
+                        group: str = 'healthy',
+                        stratum: Optional[Tuple[str, str]] = None) -> float:
+        """
+        Percentage of the group's values that are <= value.
+
+        Same result as the notebook's calculate_percentile_rank, in
+        O(log n). NaN if value is NaN or the group has no values.
+
+        Args:
+            feature: Feature name, e.g. 'BMI'
+            value: The value to rank
+            group: 'healthy', 'diabetic' or 'all'
+            stratum: Optional (stratification, label), e.g. ('age', '40-49'),
+                to rank within that stratum of the group only
+        """
+        values = self._table(group, stratum)[feature]
+        if len(values) == 0 or value != value:
+            return float('nan')
+        below = np.searchsorted(values, value, side='right')
+        return float(below / len(values) * 100)
+
+    def score(self, measurements: Dict[str, float], group: str = 'healthy',
+              stratify_by: Optional[str] = None) -> Dict[str, float]:
+        """
+        Percentile ranks of every indexed feature in measurements.
+
+        Args:
+            measurements: Feature name -> value, e.g. a row of the CSV;
+                other keys are ignored
+            group: Reference group to rank against
+            stratify_by: Optional stratification name (e.g. 'age'); the
+                stratum comes from measurements, and the whole group is
+                used when that value is missing
+
+        Returns:
+            Feature name -> percentile rank
+        """
+        stratum = None
+        if stratify_by is not None:
+            label = self.stratum(
+                stratify_by, measurements.get(self._stratum_column(stratify_by)))
+            if label is not None:
+                stratum = (stratify_by, label)
+
+        return {
+            feature: self.percentile_rank(feature, value, group, stratum)
+            for feature, value in measurements.items()
+            if feature in self._sorted[group] and value is not None
+        }
+
+    def percentile_ranks(self, data, group: str = 'healthy',
+                         stratify_by: Optional[str] = None) -> pd.DataFrame:
+        """
+        Percentile ranks for a whole cohort in one call.
+
+        Each feature is one vectorised binary search of all its values
+        against the sorted reference; there is no per-row Python loop.
+        With stratify_by, rows are ranked within their own stratum (one
+        search per stratum), or against the whole group when the
+        stratifying value is missing.
+
+        Args:
+            data: DataFrame shaped like diabetes_cleaned.csv, or a dict of
+                feature name -> array of values; columns that aren't
+                indexed features are ignored
+            group: Reference group to rank against
+            stratify_by: Optional stratification name, e.g. 'age'
+
+        Returns:
+            DataFrame with one column per indexed feature in data (index
+            kept from a DataFrame input). NaN values give NaN ranks.
+
+        Example:
+            ranks = index.percentile_ranks(cohort_df)
+            ranks.to_numpy()    # (patients, features) matrix
+        """
+        features = [feature for feature in self.features if feature in data]
+        columns = {feature: as_float_array(data[feature])
+                   for feature in features}
+        rows = len(next(iter(columns.values()))) if columns else 0
+
+        # (table, rows ranked against it) pairs
+        tables = [(self._table(group, None), np.ones(rows, dtype=bool))]
+        if stratify_by is not None:
+            column = self._stratum_column(stratify_by)
+            _, bounds, labels = self.stratifications[stratify_by]
+            codes = stratum_codes(as_float_array(data[column]), bounds)
+            tables = [(self._table(group, None), codes < 0)] + [
+                (self._table(group, (stratify_by, label)), codes == code)
+                for code, label in enumerate(labels)
+            ]
+
+        ranks = {}
+        for feature, column in columns.items():
+            result = np.full(rows, np.nan)
+            for table, selected in tables:
+                reference = table[feature]
+                if len(reference) == 0 or not selected.any():
+                    continue
+                below = np.searchsorted(reference, column[selected],
+                                        side='right')
+                result[selected] = below / len(reference) * 100
+            result[np.isnan(column)] = np.nan
+            ranks[feature] = result
+
+        index = data.index if isinstance(data, pd.DataFrame) else None
+        return pd.DataFrame(ranks, index=index, columns=features)
+
+
+def as_float_array(column) -> np.ndarray:
+    """A Series or array-like as float64, with missing values as NaN."""
+    if isinstance(column, pd.Series):
+        return column.to_numpy(dtype='float64', na_value=np.nan)
+    return np.asarray(column, dtype='float64')
+
+
+def build_index(source: str = CLEANED_PATH, output_path: str = INDEX_PATH,
+                json_path: Optional[str] = REFERENCE_PATH,
+                workers: Optional[int] = None) -> ReferenceIndex:
+    """
+    Build the index for a cleaned CSV (or shards) and save it.
+
+    Args:
+        source: Cleaned data (see DiabetesDataset for the forms accepted)
+        output_path: Where to write the Arrow index
+        json_path: Where to also write the summary as readable JSON, or
+            None to skip it
+        workers: Processes for loading shards
+
+    Returns:
+        The index that was written
+    """
+    dataset = DiabetesDataset(source, engine='pyarrow',
+                              columns=REFERENCE_FEATURES + [CLASS_COLUMN],
+                              workers=workers)
+    index = ReferenceIndex.from_frame(dataset.df)
+    index.save(output_path)
+    if json_path is not None:
+        write_reference(index.summary, json_path)
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Build the sorted percentile-rank reference index')
+    parser.add_argument('source', nargs='?', default=CLEANED_PATH,
+                        help='cleaned CSV, directory of shards or glob')
+    parser.add_argument('output_path', nargs='?', default=INDEX_PATH)
+    parser.add_argument('--json', dest='json_path', default=REFERENCE_PATH,
+                        help='also write the summary as JSON here')
+    parser.add_argument('--no-json', dest='json_path', action='store_const',
+                        const=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.source, args.output_path, args.json_path,
+                        args.workers)
+    print(f"Indexed {len(index.values):,} values to {args.output_path} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# Versioned reference snapshots that a running app can pick up live.
+#
+# Rebuilding the reference index used to mean restarting app.py, which
+# drops every user session. Instead, each build is published as an
+# immutable snapshot file, reference/snapshots/diabetes_reference.<version>.arrow,
+# and a small CURRENT file names the live version. A version is
+# <sequence>-<UTC time>-<content hash>; the sequence number goes up by one
+# with every publish, so versions order by age even within one second and
+# a name is never reused. Publishing writes the
+# snapshot first and then replaces CURRENT with a rename, so a reader sees
+# either the old version or the new one, never a mix.
+#
+# ReferenceStore.current() checks CURRENT at most every check_interval
+# seconds and, when it names a new version, loads that snapshot and swaps
+# it in for later calls. A request keeps using the ReferenceSnapshot it
+# was handed, so in-flight requests finish on the old version. Snapshots
+# are memory-mapped (see ReferenceIndex.load), and the mapping is closed
+# when the last reference to the old snapshot goes away.
+#
+# Usage:
+#     python reference_store.py                 # publish the built index
+#     python reference_store.py --build         # rebuild it, then publish
+
+import argparse
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from atomic_file import write_atomic
+from data_cleaning import CLEANED_PATH
+from reference_index import (INDEX_PATH, ReferenceIndex, build_index,
+                             index_digest)
+
+
+SNAPSHOT_DIR = './reference/snapshots'
+CURRENT_NAME = 'CURRENT'
+SNAPSHOT_PREFIX = 'diabetes_reference.'
+SNAPSHOT_SUFFIX = '.arrow'
+
+# Version reported for the unversioned INDEX_PATH fallback
+UNVERSIONED = 'unversioned'
+
+# How often, at most, current() looks for a new version
+DEFAULT_CHECK_INTERVAL = 2.0
+
+# Old snapshots kept on disk when publishing
+DEFAULT_KEEP = 3
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """One published version of the reference index."""
+    version: str
+    index: ReferenceIndex
+    path: str
+    loaded_at: float
+
+
+def snapshot_path(version: str, directory: str = SNAPSHOT_DIR) -> str:
+    """Path of a snapshot version's Arrow file."""
+    return os.path.join(directory, f'{SNAPSHOT_PREFIX}{version}{SNAPSHOT_SUFFIX}')
+
+
+def version_sequence(version: str) -> int:
+    """
+    Publish sequence number of a version, e.g. 12 for
+    '000012-20240101T120000Z-0123456789ab'; 0 for versions from before
+    versions were numbered.
+    """
+    sequence = version.split('-', 1)[0]
+    return int(sequence) if sequence.isdigit() else 0
+
+
+def list_versions(directory: str = SNAPSHOT_DIR) -> List[str]:
+    """Versions with a snapshot file in directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    versions = [
+        name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+        for name in os.listdir(directory)
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+    ]
+    return sorted(versions, key=lambda version: (version_sequence(version),
+                                                 version))
+
+
+def read_current_version(directory: str = SNAPSHOT_DIR) -> Optional[str]:
+    """The live version named by CURRENT, or None if nothing is published."""
+    try:
+        with open(os.path.join(directory, CURRENT_NAME)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ============================================================
+# PUBLISHING
+# ============================================================
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def publish_snapshot(index_path: str = INDEX_PATH,
+                     directory: str = SNAPSHOT_DIR,
+                     keep: int = DEFAULT_KEEP) -> str:
+    """
+    Publish a built index file as the new live snapshot.
+
+    The version is a sequence number one above every published version,
+    the UTC publish time and a short content hash, so versions sort by
+    age and republishing an unchanged index is a no-op.
+
+    Args:
+        index_path: Arrow index written by reference_index.py
+        directory: Snapshot folder
+        keep: Older snapshots to keep on disk besides the live one (a
+            running app may still be serving from them)
+
+    Returns:
+        The live version
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = index_digest(index_path)
+    current = read_current_version(directory)
+    if current is not None and current.endswith(digest):
+        return current
+
+    published = list_versions(directory)
+    if current is not None:
+        published.append(current)
+    sequence = max(map(version_sequence, published), default=0) + 1
+    version = (f"{sequence:06d}-"
+               f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{digest}")
+    write_atomic(snapshot_path(version, directory),
+                 lambda tmp_path: shutil.copyfile(index_path, tmp_path))
+    write_atomic(os.path.join(directory, CURRENT_NAME),
+                 lambda tmp_path: _write_text(tmp_path, version + '\n'))
+
+    # Remove the oldest snapshots; a process that still maps one keeps
+    # its pages until it lets go of it
+    older = [v for v in list_versions(directory) if v != version]
+    for old in older[:max(len(older) - keep, 0)]:
+        try:
+            os.remove(snapshot_path(old, directory))
+        except OSError:
+            pass
+    return version
+
+
+# ============================================================
+# LOADING
+# ============================================================
+
+class ReferenceStore:
+    """
+    Hands out the live reference snapshot, swapping in new versions as
+    they are published.
+
+    Take one snapshot per request and use it throughout, so a request
+    never mixes two versions:
+
+    Example:
+        store = ReferenceStore()
+
+        reference = store.current()
+        ranks = reference.index.score(measurements)
+        print(reference.version)
+
+    Thread-safe: concurrent callers share one load of each new version.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR,
+                 check_interval: float = DEFAULT_CHECK_INTERVAL,
+                 fallback_path: Optional[str] = INDEX_PATH):
+        """
+        Args:
+            directory: Snapshot folder written by publish_snapshot
+            check_interval: Seconds between checks of CURRENT (0 checks on
+                every call)
+            fallback_path: Unversioned index to serve while nothing has
+                been published, or None to require a snapshot
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self.fallback_path = fallback_path
+        self.reloads = 0
+
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._checked_at = float('-inf')
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the snapshot currently handed out."""
+        return self._snapshot.version if self._snapshot else None
+
+    def current(self) -> ReferenceSnapshot:
+        """
+        The live snapshot, reloaded first if a new version was published.
+
+        The snapshot returned is never modified, so callers can keep it
+        for as long as they need; once no caller holds an old snapshot its
+        memory map is released.
+        """
+        snapshot = self._snapshot
+        if (snapshot is not None
+                and time.monotonic() - self._checked_at < self.check_interval):
+            return snapshot
+
+        with self._lock:
+            # Another thread may have checked while this one waited
+            if (self._snapshot is not None and
+                    time.monotonic() - self._checked_at < self.check_interval):
+                return self._snapshot
+
+            version = read_current_version(self.directory)
+            if self._snapshot is None or version != self._snapshot.version:
+                loaded = self._load(version)
+                if loaded is not None:
+                    if self._snapshot is not None:
+                        self.reloads += 1
+                    self._snapshot = loaded
+            self._checked_at = time.monotonic()
+            if self._snapshot is None:
+                raise FileNotFoundError(
+                    f"No reference snapshot in {self.directory}")
+            return self._snapshot
+
+    def _load(self, version: Optional[str]) -> Optional[ReferenceSnapshot]:
+        # Open a version (or the fallback when version is None); None if
+        # the file is gone, so the current snapshot stays in service
+        if version is None:
+            if self.fallback_path is None or self._snapshot is not None:
+                return None
+            path, version = self.fallback_path, UNVERSIONED
+        else:
+            path = snapshot_path(version, self.directory)
+        try:
+            index = ReferenceIndex.load(path)
+        except FileNotFoundError:
+            return None
+        return ReferenceSnapshot(version, index, path, time.time())
+
+
+# ============================================================
+# COMMAND LINE
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Publish the reference index as a new live snapshot')
+    parser.add_argument('index_path', nargs='?', default=INDEX_PATH)
+    parser.add_argument('--directory', default=SNAPSHOT_DIR)
+    parser.add_argument('--build', action='store_true',
+                        help='rebuild the index from the cleaned data first')
+    parser.add_argument('--source', default=CLEANED_PATH,
+                        help='cleaned data to build from (with --build)')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                        help='older snapshots to keep on disk')
+    args = parser.parse_args()
+
+    if args.build:
+        build_index(args.source, args.index_path)
+    version = publish_snapshot(args.index_path, args.directory, args.keep)
+    print(f"Live reference version: {version}")
+
+
+if __name__ == "__main__":
+    main()
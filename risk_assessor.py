@@ -0,0 +1,395 @@
+# Diabetes risk assessment from a HealthProfile.
+#
+# The Phase 3 notebook's get_risk_level and assess_patient_risk, as a
+# library: each measurement is ranked against the healthy reference group
+# (with ReferenceIndex, so a rank is a binary search), the percentile gives
+# a risk level, and the levels' mean gives the overall risk.
+#
+#   percentile < 25  Low       (score 0)
+#   percentile < 75  Normal    (score 1)
+#   percentile < 90  Elevated  (score 2)
+#   otherwise        High      (score 3)
+#
+#   mean score >= 2  HIGH,  >= 1  MODERATE,  otherwise  LOW
+#
+# RiskAssessor.assess scores one validated profile. assess_batch scores
+# columns of many profiles at once: every step is a NumPy operation over a
+# whole column, with no Python loop over the profiles. Both can rank
+# within the profile's age band or pregnancy bucket (stratify_by) rather
+# than against the whole reference group.
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from health_profile import FEATURE_COLUMNS, VALID_RANGES, HealthProfile
+from reference_index import ReferenceIndex, as_float_array
+
+
+# Risk levels, indexed by risk code (which is also the level's score)
+RISK_LEVELS = ('Low', 'Normal', 'Elevated', 'High')
+
+# Percentiles at which each level after Low starts
+RISK_THRESHOLDS = (25, 75, 90)
+
+RISK_EMOJI = ('✅', '⚠️', '⚠️', '🔴')
+
+RISK_MESSAGES = (
+    'Your {feature} is in the healthy range (lower than average)',
+    'Your {feature} is in the typical range',
+    'Your {feature} is above average and worth monitoring',
+    'Your {feature} is significantly elevated',
+)
+
+# Overall risk, indexed by overall code
+OVERALL_LEVELS = ('LOW', 'MODERATE', 'HIGH')
+
+# Mean risk scores at which each overall level after LOW starts
+OVERALL_THRESHOLDS = (1, 2)
+
+OVERALL_MESSAGES = (
+    '✅ LOW RISK - Most factors in healthy range',
+    '⚠️ MODERATE RISK - Some risk factors present',
+    '🔴 HIGH RISK - Multiple elevated risk factors',
+)
+
+# HealthProfile fields that must be present
+REQUIRED_FIELDS = ('glucose', 'blood_pressure', 'bmi', 'age')
+
+# Code used for a missing level in batch results
+MISSING_CODE = -1
+
+
+def check_profile(profile: HealthProfile) -> None:
+    """
+    Raise ValueError if a profile can't be assessed: it fails validation,
+    or a required measurement is NaN (which the range checks let through).
+    """
+    errors = profile.validation_errors
+    errors += [f"{field.replace('_', ' ').title()} is missing"
+               for field in REQUIRED_FIELDS
+               if getattr(profile, field) != getattr(profile, field)]
+    if errors:
+        raise ValueError('Invalid health profile: ' + '; '.join(errors))
+
+
+def risk_code(percentile: float) -> int:
+    """Risk code (index into RISK_LEVELS) of a percentile."""
+    return int(np.searchsorted(RISK_THRESHOLDS, percentile, side='right'))
+
+
+def overall_code(score: float) -> int:
+    """Overall code (index into OVERALL_LEVELS) of a mean risk score."""
+    return int(np.searchsorted(OVERALL_THRESHOLDS, score, side='right'))
+
+
+# ============================================================
+# RESULTS
+# ============================================================
+
+@dataclass(frozen=True)
+class FeatureRisk:
+    """The assessment of one measurement."""
+    value: float
+    percentile: float
+    code: int
+
+    @property
+    def level(self) -> str:
+        return RISK_LEVELS[self.code]
+
+    @property
+    def emoji(self) -> str:
+        return RISK_EMOJI[self.code]
+
+
+@dataclass(frozen=True)
+class RiskAssessment:
+    """
+    The assessment of one profile.
+
+    Attributes:
+        features: Column name (e.g. 'BMI') -> FeatureRisk, for every
+            measurement the profile has
+        score: Mean risk score of the features (0-3)
+        code: Overall code, an index into OVERALL_LEVELS
+    """
+    features: Dict[str, FeatureRisk]
+    score: float
+    code: int
+
+    @property
+    def overall(self) -> str:
+        return OVERALL_LEVELS[self.code]
+
+    @property
+    def message(self) -> str:
+        return OVERALL_MESSAGES[self.code]
+
+    def feature_message(self, feature: str) -> str:
+        """The notebook's explanation of one feature's risk level."""
+        return RISK_MESSAGES[self.features[feature].code].format(
+            feature=feature)
+
+    def to_dict(self) -> Dict[str, object]:
+        """The notebook's assess_patient_risk result."""
+        result = {
+            feature: {
+                'value': risk.value,
+                'percentile': risk.percentile,
+                'risk_level': risk.level,
+                'emoji': risk.emoji,
+                'message': self.feature_message(feature),
+            }
+            for feature, risk in self.features.items()
+        }
+        result['overall_assessment'] = self.message
+        return result
+
+
+@dataclass(frozen=True)
+class RiskBatch:
+    """
+    The assessment of many profiles, as arrays.
+
+    Attributes:
+        features: Column names, in the column order of the 2-D arrays
+        percentiles: (profiles, features) percentile ranks, NaN where a
+            measurement is missing
+        codes: (profiles, features) int8 risk codes, MISSING_CODE where a
+            measurement is missing
+        score: Mean risk score per profile, NaN for invalid profiles
+        overall: int8 overall code per profile, MISSING_CODE for invalid
+            profiles
+        valid: Whether each profile passes HealthProfile's validation
+    """
+    features: List[str]
+    percentiles: np.ndarray
+    codes: np.ndarray
+    score: np.ndarray
+    overall: np.ndarray
+    valid: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+    def to_frame(self, index=None) -> pd.DataFrame:
+        """
+        One row per profile: '<feature>_percentile' and '<feature>_risk'
+        columns, then 'risk_score' and 'overall_risk'.
+        """
+        columns = {}
+        for f, feature in enumerate(self.features):
+            columns[f'{feature}_percentile'] = self.percentiles[:, f]
+            columns[f'{feature}_risk'] = pd.Categorical.from_codes(
+                self.codes[:, f], RISK_LEVELS)
+        columns['risk_score'] = self.score
+        columns['overall_risk'] = pd.Categorical.from_codes(
+            self.overall, OVERALL_LEVELS)
+        return pd.DataFrame(columns, index=index)
+
+
+# ============================================================
+# THE ASSESSOR
+# ============================================================
+
+def profiles_to_columns(profiles: Sequence[HealthProfile]
+                        ) -> Dict[str, np.ndarray]:
+    """
+    Columns of HealthProfile field -> float array for assess_batch, with
+    NaN for optional fields a profile doesn't have.
+    """
+    return {
+        field: np.array([np.nan if getattr(profile, field) is None
+                         else getattr(profile, field)
+                         for profile in profiles], dtype='float64')
+        for field in FEATURE_COLUMNS
+    }
+
+
+class RiskAssessor:
+    """
+    Scores diabetes risk for HealthProfiles against a reference group.
+
+    Example:
+        assessor = RiskAssessor()
+        assessment = assessor.assess(HealthProfile(glucose=140,
+                                                   blood_pressure=88,
+                                                   bmi=34.5, age=45))
+        assessment.overall                    # 'MODERATE'
+        assessment.features['BMI'].level      # 'Normal'
+
+        batch = assessor.assess_batch(profiles_df)   # snake_case columns
+        batch.score                           # mean risk score per profile
+
+        # Rank against healthy people of the same age band instead
+        assessor.assess(profile, stratify_by='age')
+    """
+
+    def __init__(self, index: Optional[ReferenceIndex] = None,
+                 group: str = 'healthy'):
+        """
+        Args:
+            index: Reference index to rank against (default: load the
+                saved index, reference/diabetes_reference.arrow)
+            group: Reference group, 'healthy' as in the notebook
+        """
+        self.index = index if index is not None else ReferenceIndex.load()
+        self.group = group
+        self.features = [column for column in FEATURE_COLUMNS.values()
+                         if column in self.index.features]
+        # Column name -> HealthProfile field
+        self._fields = {column: field
+                        for field, column in FEATURE_COLUMNS.items()}
+
+        # For the batch path, each feature's distinct reference values and
+        # the percentile and risk code of every interval between them. A
+        # reference has only a few hundred distinct values, so the binary
+        # search is shorter and the rest of the work is two array lookups.
+        self._breaks: Dict[str, np.ndarray] = {}
+        self._percentiles: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        for feature in self.features:
+            reference = self.index.reference_values(feature, group)
+            if len(reference) == 0:
+                continue
+            breaks = np.unique(reference)
+            below = np.searchsorted(reference, breaks, side='right')
+            percentiles = np.concatenate([[0], below]) / len(reference) * 100
+            self._breaks[feature] = breaks
+            self._percentiles[feature] = percentiles
+            self._codes[feature] = np.searchsorted(
+                RISK_THRESHOLDS, percentiles, side='right').astype(np.int8)
+
+    def assess(self, profile: HealthProfile,
+               stratify_by: Optional[str] = None) -> RiskAssessment:
+        """
+        Assess one profile.
+
+        NaN optional measurements are treated as missing, as in
+        assess_batch.
+
+        Args:
+            profile: The measurements
+            stratify_by: Optional stratification of the reference index
+                (e.g. 'age'), to rank against people in the profile's
+                own stratum rather than the whole group
+
+        Raises:
+            ValueError: If the profile fails validation or a required
+                measurement is NaN
+        """
+        check_profile(profile)
+        measurements = profile.to_dict()
+
+        stratum = None
+        if stratify_by is not None:
+            label = self.index.stratum(stratify_by, measurements.get(
+                self._fields[self.index.stratifications[stratify_by][0]]))
+            if label is not None:
+                stratum = (stratify_by, label)
+
+        features = {}
+        for field, value in measurements.items():
+            column = FEATURE_COLUMNS[field]
+            if column not in self.features or value != value:
+                continue
+            percentile = self.index.percentile_rank(column, value, self.group,
+                                                    stratum)
+            if percentile != percentile:
+                continue
+            features[column] = FeatureRisk(value, percentile,
+                                           risk_code(percentile))
+
+        # Same feature order as the batch path and the reference file
+        features = {column: features[column] for column in self.features
+                    if column in features}
+        codes = [risk.code for risk in features.values()]
+        score = sum(codes) / len(codes) if codes else 0.0
+        return RiskAssessment(features, score, overall_code(score))
+
+    def assess_batch(self, profiles,
+                     stratify_by: Optional[str] = None) -> RiskBatch:
+        """
+        Assess many profiles at once.
+
+        Args:
+            profiles: Columns keyed by HealthProfile field name ('glucose',
+                'blood_pressure', ...): a DataFrame, a dict of arrays, or
+                the output of profiles_to_columns. Optional fields may be
+                absent or NaN; pregnancies defaults to 0.
+            stratify_by: Optional stratification (e.g. 'age'); each
+                profile is ranked within its own stratum, one vectorised
+                search per stratum (ReferenceIndex.percentile_ranks)
+
+        Returns:
+            RiskBatch with the same results assess() gives each profile
+            (invalid profiles get no score instead of an exception)
+        """
+        columns = {field: as_float_array(profiles[field])
+                   for field in FEATURE_COLUMNS if field in profiles}
+        for field in REQUIRED_FIELDS:
+            if field not in columns:
+                raise ValueError(f"Profiles are missing required field {field!r}")
+        rows = len(columns['glucose'])
+        if 'pregnancies' not in columns:
+            columns['pregnancies'] = np.zeros(rows)
+
+        # HealthProfile's range checks, a column at a time (NaN compares
+        # False, so a missing optional field passes)
+        valid = np.ones(rows, dtype=bool)
+        for field, values in columns.items():
+            low, high = VALID_RANGES[field]
+            valid &= ~((values < low) | (values > high))
+        for field in REQUIRED_FIELDS:
+            valid &= ~np.isnan(columns[field])
+
+        ranks = None
+        if stratify_by is not None:
+            ranks = self.index.percentile_ranks(
+                {feature: columns[self._fields[feature]]
+                 for feature in self.features
+                 if self._fields[feature] in columns},
+                self.group, stratify_by)
+
+        # Column-major, so each feature's results are written contiguously
+        percentiles = np.full((rows, len(self.features)), np.nan, order='F')
+        codes = np.full((rows, len(self.features)), MISSING_CODE,
+                        dtype=np.int8, order='F')
+        total = np.zeros(rows)
+        count = np.zeros(rows)
+        for f, feature in enumerate(self.features):
+            values = columns.get(self._fields[feature])
+            if values is None:
+                continue
+            if ranks is not None:
+                percentile = ranks[feature].to_numpy(copy=True)
+                missing = np.isnan(percentile)
+                code = np.searchsorted(RISK_THRESHOLDS, percentile,
+                                       side='right').astype(np.int8)
+            elif feature in self._breaks:
+                missing = np.isnan(values)
+                interval = np.searchsorted(self._breaks[feature], values,
+                                           side='right')
+                percentile = self._percentiles[feature][interval]
+                code = self._codes[feature][interval]
+            else:
+                continue
+            code[missing] = MISSING_CODE
+            percentile[missing] = np.nan
+            percentiles[:, f] = percentile
+            codes[:, f] = code
+            total += np.maximum(code, 0)
+            count += ~missing
+
+        # A profile with no ranked features scores 0, as in the notebook
+        score = np.divide(total, count, out=np.zeros(rows), where=count > 0)
+        overall = np.searchsorted(OVERALL_THRESHOLDS, score,
+                                  side='right').astype(np.int8)
+        score[~valid] = np.nan
+        overall[~valid] = MISSING_CODE
+        return RiskBatch(list(self.features), percentiles, codes, score,
+                         overall, valid)
+
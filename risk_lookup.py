@@ -0,0 +1,288 @@
+# Precomputed risk levels for the four core features.
+#
+# HealthProfile.get_core_features() - glucose, blood pressure, BMI and
+# age - are bounded by VALID_RANGES and recorded at a fixed precision
+# (whole mg/dL, mm Hg and years, BMI to 0.1), so each has only a few
+# hundred possible values: 156 glucose, 99 blood pressure, 490 BMI and 61
+# age values. RiskLookupTable stores the risk code (see risk_assessor.py)
+# of every one of them, packed four 2-bit codes to a byte, about 200
+# bytes in all. A lookup is an index calculation and a byte read, and the
+# overall risk is the sum of the four codes, so a core-feature assessment
+# is O(1) with no percentile computation.
+#
+# There is deliberately no 4-D table over all combinations: a feature's
+# risk level depends only on its own value and the overall risk only on
+# the sum of the levels, so the 462 million cells (over 100 MB packed)
+# would repeat what the four 1-D tables already say.
+#
+# Values between grid points are rounded to the nearest one, so a lookup
+# gives RiskAssessor's result for the rounded measurements.
+#
+# The file records the digest of the index it was computed from (the one
+# reference snapshot versions end in), and load() refuses a table built
+# from a different index, so a rebuilt reference can't be served next to
+# stale risk codes.
+#
+# Usage:
+#     python risk_lookup.py
+#     python risk_lookup.py reference/diabetes_reference.arrow out.arrow
+
+import argparse
+import json
+from typing import Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from atomic_file import write_atomic
+from health_profile import FEATURE_COLUMNS, VALID_RANGES, HealthProfile
+from reference_index import INDEX_PATH, ReferenceIndex, index_digest
+from risk_assessor import (MISSING_CODE, OVERALL_THRESHOLDS, RISK_THRESHOLDS,
+                           FeatureRisk, RiskAssessment, check_profile,
+                           overall_code)
+
+
+LOOKUP_PATH = './reference/diabetes_risk_lookup.arrow'
+_METADATA_KEY = b'risk_lookup.grid'
+_SOURCE_KEY = b'risk_lookup.source_digest'
+
+# Core features and the spacing of their grid of values
+CORE_STEPS = {
+    'glucose': 1,
+    'blood_pressure': 1,
+    'bmi': 0.1,
+    'age': 1,
+}
+
+# Decimal places of each step, used to round grid values exactly
+_STEP_DECIMALS = {'glucose': 0, 'blood_pressure': 0, 'bmi': 1, 'age': 0}
+
+CODE_BITS = 2
+CODES_PER_BYTE = 8 // CODE_BITS
+
+
+def pack_codes(codes: np.ndarray) -> np.ndarray:
+    """Pack risk codes 0-3 four to a byte, first code in the low bits."""
+    padded = np.zeros(-(-len(codes) // CODES_PER_BYTE) * CODES_PER_BYTE,
+                      dtype=np.uint8)
+    padded[:len(codes)] = codes
+    padded = padded.reshape(-1, CODES_PER_BYTE)
+    shifts = np.arange(CODES_PER_BYTE, dtype=np.uint8) * CODE_BITS
+    return np.bitwise_or.reduce(padded << shifts, axis=1).astype(np.uint8)
+
+
+def unpack_codes(packed: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """The codes at positions of a pack_codes() array."""
+    shifts = (positions % CODES_PER_BYTE) * CODE_BITS
+    return (packed[positions // CODES_PER_BYTE] >> shifts) & 0b11
+
+
+class RiskLookupTable:
+    """
+    Risk codes of every grid value of the core features.
+
+    Example:
+        table = build_lookup()                   # from INDEX_PATH
+
+        table = RiskLookupTable.load()           # checked against INDEX_PATH
+        table.built_from(reference.path)         # same index as a snapshot?
+        table.code('bmi', 34.5)                  # 1, Normal
+        assessment = table.assess(profile)       # core features only
+        codes, score, overall = table.assess_batch(columns)
+    """
+
+    def __init__(self, packed: np.ndarray, grid: Dict[str, Dict[str, float]],
+                 source_digest: Optional[str] = None):
+        """
+        Args:
+            packed: Every feature's packed codes, one after another
+            grid: Feature -> {'low', 'step', 'size', 'offset'}, where
+                offset is the feature's first code position in packed
+            source_digest: index_digest() of the index file the codes were
+                computed from, if known
+        """
+        self.packed = np.asarray(packed, dtype=np.uint8)
+        self.grid = grid
+        self.source_digest = source_digest
+        self.features = list(grid)
+        # Plain bytes for single lookups, which are quicker without NumPy
+        self._bytes = self.packed.tobytes()
+
+    # ============================================================
+    # BUILDING AND SAVING
+    # ============================================================
+
+    @classmethod
+    def from_index(cls, index: ReferenceIndex, group: str = 'healthy',
+                   source_digest: Optional[str] = None) -> 'RiskLookupTable':
+        """
+        Compute the codes from a reference index, as RiskAssessor would.
+        Pass the index file's index_digest() as source_digest so that
+        load() can check it.
+        """
+        codes, grid, offset = [], {}, 0
+        for field, step in CORE_STEPS.items():
+            low, high = VALID_RANGES[field]
+            size = int(round((high - low) / step)) + 1
+            values = np.round(low + step * np.arange(size),
+                              _STEP_DECIMALS[field])
+            reference = index.reference_values(FEATURE_COLUMNS[field], group)
+            percentiles = (np.searchsorted(reference, values, side='right')
+                           / len(reference) * 100)
+            codes.append(np.searchsorted(RISK_THRESHOLDS, percentiles,
+                                         side='right'))
+            grid[field] = {'low': low, 'step': step, 'size': size,
+                           'offset': offset}
+            offset += size
+        return cls(pack_codes(np.concatenate(codes)), grid, source_digest)
+
+    def save(self, path: str = LOOKUP_PATH) -> None:
+        """Write the packed codes as an Arrow IPC file, atomically."""
+        table = pa.table({'codes': pa.array(self.packed, type=pa.uint8())})
+        metadata = {_METADATA_KEY: json.dumps(self.grid).encode()}
+        if self.source_digest is not None:
+            metadata[_SOURCE_KEY] = self.source_digest.encode()
+        table = table.replace_schema_metadata(metadata)
+
+        write_atomic(path, lambda tmp_path: feather.write_feather(
+            table, tmp_path, compression='uncompressed'))
+
+    @classmethod
+    def load(cls, path: str = LOOKUP_PATH,
+             index_path: Optional[str] = INDEX_PATH) -> 'RiskLookupTable':
+        """
+        Read a saved table.
+
+        Args:
+            path: Arrow file written by save()
+            index_path: Index file the table must have been built from, or
+                None to skip the check
+
+        Raises:
+            ValueError: If the table was built from a different index (or
+                doesn't record its source)
+        """
+        table = feather.read_table(path)
+        metadata = table.schema.metadata
+        grid = json.loads(metadata[_METADATA_KEY])
+        source = metadata.get(_SOURCE_KEY)
+        lookup = cls(table.column('codes').to_numpy(), grid,
+                     source.decode() if source is not None else None)
+        if index_path is not None and not lookup.built_from(index_path):
+            raise ValueError(
+                f"{path} was not built from {index_path} (source digest "
+                f"{lookup.source_digest}, index digest "
+                f"{index_digest(index_path)}); rebuild it with "
+                f"'python risk_lookup.py'")
+        return lookup
+
+    def built_from(self, index_path: str) -> bool:
+        """
+        Whether the codes were computed from the index file at index_path,
+        e.g. a ReferenceStore snapshot's path.
+        """
+        return (self.source_digest is not None
+                and self.source_digest == index_digest(index_path))
+
+    # ============================================================
+    # LOOKUPS
+    # ============================================================
+
+    def _positions(self, field: str, values: np.ndarray) -> np.ndarray:
+        # Code positions of values in packed, -1 off the grid or for NaN
+        grid = self.grid[field]
+        steps = np.round((values - grid['low']) / grid['step'])
+        on_grid = (steps >= 0) & (steps < grid['size'])
+        return np.where(on_grid, np.nan_to_num(steps) + grid['offset'],
+                        -1).astype(np.int64)
+
+    def code(self, field: str, value: float) -> int:
+        """
+        Risk code of one core feature value (e.g. code('bmi', 34.5)), or
+        MISSING_CODE if the value is NaN or outside VALID_RANGES.
+        """
+        if value != value:
+            return MISSING_CODE
+        grid = self.grid[field]
+        step = round((value - grid['low']) / grid['step'])
+        if not 0 <= step < grid['size']:
+            return MISSING_CODE
+        position = grid['offset'] + step
+        shift = (position % CODES_PER_BYTE) * CODE_BITS
+        return (self._bytes[position // CODES_PER_BYTE] >> shift) & 0b11
+
+    def assess(self, profile: HealthProfile) -> RiskAssessment:
+        """
+        Risk levels and overall risk of a profile's core features.
+
+        Percentiles aren't stored, so each FeatureRisk's percentile is NaN.
+
+        Raises:
+            ValueError: If the profile fails validation
+        """
+        check_profile(profile)
+        features = {}
+        for field, value in profile.get_core_features().items():
+            features[FEATURE_COLUMNS[field]] = FeatureRisk(
+                value, float('nan'), self.code(field, value))
+        total = sum(risk.code for risk in features.values())
+        score = total / len(features)
+        return RiskAssessment(features, score, overall_code(score))
+
+    def assess_batch(self, columns):
+        """
+        Core-feature risk of many profiles at once.
+
+        Args:
+            columns: 'glucose', 'blood_pressure', 'bmi' and 'age' arrays,
+                e.g. a DataFrame or profiles_to_columns() output
+
+        Returns:
+            (codes, score, overall): (profiles, 4) int8 risk codes, the
+            mean code per profile and the int8 overall code per profile;
+            a profile with a value off the grid gets MISSING_CODE for it,
+            a NaN score and MISSING_CODE overall
+        """
+        codes = []
+        for field in self.features:
+            values = np.asarray(columns[field], dtype='float64')
+            positions = self._positions(field, values)
+            code = unpack_codes(self.packed, np.maximum(positions, 0))
+            codes.append(np.where(positions < 0, MISSING_CODE,
+                                  code).astype(np.int8))
+        codes = np.column_stack(codes)
+
+        off_grid = (codes < 0).any(axis=1)
+        score = codes.sum(axis=1) / len(self.features)
+        score[off_grid] = np.nan
+        overall = np.searchsorted(OVERALL_THRESHOLDS, np.nan_to_num(score),
+                                  side='right').astype(np.int8)
+        overall[off_grid] = MISSING_CODE
+        return codes, score, overall
+
+
+def build_lookup(index_path: str = INDEX_PATH,
+                 output_path: str = LOOKUP_PATH) -> RiskLookupTable:
+    """Build the lookup table from a saved reference index and save it."""
+    table = RiskLookupTable.from_index(ReferenceIndex.load(index_path),
+                                       source_digest=index_digest(index_path))
+    table.save(output_path)
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Build the core-feature risk lookup table')
+    parser.add_argument('index_path', nargs='?', default=INDEX_PATH)
+    parser.add_argument('output_path', nargs='?', default=LOOKUP_PATH)
+    args = parser.parse_args()
+
+    table = build_lookup(args.index_path, args.output_path)
+    cells = sum(grid['size'] for grid in table.grid.values())
+    print(f"Wrote {cells} risk codes in {table.packed.nbytes} bytes "
+          f"to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
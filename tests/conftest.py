@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules live at the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RAW_PATH = os.path.join(ROOT, 'data', 'raw', 'diabetes.csv')
+CLEANED_PATH = os.path.join(ROOT, 'data', 'processed', 'diabetes_cleaned.csv')
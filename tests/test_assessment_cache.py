@@ -0,0 +1,32 @@
+import math
+
+from assessment_cache import AssessmentCache
+from health_profile import HealthProfile
+
+
+def test_near_identical_profiles_share_an_entry():
+    cache = AssessmentCache(max_entries=2, ttl=None)
+    first = cache.assess(HealthProfile(glucose=140.2, blood_pressure=88,
+                                       bmi=34.52, age=45))
+    second = cache.assess(HealthProfile(glucose=139.8, blood_pressure=88,
+                                        bmi=34.48, age=45))
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_nan_measurement_hits_the_cache():
+    cache = AssessmentCache(ttl=None)
+    for _ in range(2):
+        cache.assess(HealthProfile(glucose=140, blood_pressure=88, bmi=34.5,
+                                   age=45, insulin=math.nan))
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AssessmentCache(max_entries=2, ttl=None)
+    for glucose in (100, 110, 100, 120):
+        cache.assess(HealthProfile(glucose=glucose, blood_pressure=70,
+                                   bmi=25, age=30))
+    assert cache.evictions == 1
+    cache.assess(HealthProfile(glucose=100, blood_pressure=70, bmi=25, age=30))
+    assert cache.hits == 2
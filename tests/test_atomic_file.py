@@ -0,0 +1,51 @@
+import os
+import threading
+
+import pytest
+
+from atomic_file import write_atomic
+
+
+def test_concurrent_writers_never_leave_a_partial_file(tmp_path):
+    path = str(tmp_path / 'out.txt')
+    start = threading.Barrier(8)
+    errors = []
+
+    def write(tmp_path, text):
+        with open(tmp_path, 'w') as f:
+            start.wait()
+            # Written in pieces so the writers interleave
+            for _ in range(200):
+                f.write(text)
+                f.flush()
+
+    def writer(i):
+        try:
+            write_atomic(path, lambda tmp_path: write(tmp_path, f'{i}' * 50))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    text = open(path).read()
+    assert len(text) == 200 * 50 and len(set(text)) == 1
+    assert os.listdir(tmp_path) == ['out.txt']
+
+
+def test_failed_write_leaves_target_and_no_temp_file(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('old')
+
+    def fail(tmp_path):
+        open(tmp_path, 'w').write('partial')
+        raise RuntimeError('disk full')
+
+    with pytest.raises(RuntimeError):
+        write_atomic(str(path), fail)
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['out.txt']
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH, RAW_PATH
+from data_cleaning import (CleaningReport, CleaningRule, clean_chunk,
+                           clean_file, compile_rules, rebuild_incremental)
+
+
+def edited_raw(tmp_path, inserts):
+    # Copy of the raw file with lines inserted at the given line numbers
+    with open(RAW_PATH) as f:
+        lines = f.read().splitlines(True)
+    for line_number, line in sorted(inserts, reverse=True):
+        lines.insert(line_number, line)
+    path = tmp_path / 'raw.csv'
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_clean_file_matches_notebook_output(tmp_path):
+    out = tmp_path / 'cleaned.csv'
+    clean_file(RAW_PATH, str(out))
+    assert read(out) == read(CLEANED_PATH)
+
+
+@pytest.mark.parametrize('chunksize', [50, 300, 100_000])
+def test_output_does_not_depend_on_chunksize(tmp_path, chunksize):
+    raw = edited_raw(tmp_path, [(400, ',120,70,0,0,30.1,0.5,40,1\n')])
+    whole, chunked = tmp_path / 'whole.csv', tmp_path / 'chunked.csv'
+    clean_file(raw, str(whole), chunksize=1_000_000)
+    clean_file(raw, str(chunked), chunksize=chunksize)
+    assert read(chunked) == read(whole)
+
+
+def test_incremental_rebuild_after_edit_matches_full_rebuild(tmp_path):
+    out = tmp_path / 'incremental.csv'
+    rebuild_incremental(RAW_PATH, str(out), avg_chunk_rows=64)
+
+    # An empty integer cell and a fractional count in otherwise
+    # untouched data
+    raw = edited_raw(tmp_path, [(400, ',120,70,0,0,30.1,0.5,40,1\n'),
+                                (5, '2.5,120,70,0,0,30.1,0.5,40,1\n')])
+    report = rebuild_incremental(raw, str(out), avg_chunk_rows=64)
+    full = tmp_path / 'full.csv'
+    clean_file(raw, str(full))
+
+    assert report.chunks_reused > 0
+    assert read(out) == read(full)
+
+
+def test_unchanged_rebuild_reuses_every_chunk_byte_for_byte(tmp_path):
+    out = tmp_path / 'incremental.csv'
+    rebuild_incremental(RAW_PATH, str(out), avg_chunk_rows=64)
+    first = read(out)
+
+    report = rebuild_incremental(RAW_PATH, str(out), avg_chunk_rows=64)
+    assert report.chunks_reused == report.chunks
+    assert read(out) == first == read(CLEANED_PATH)
+
+
+@pytest.mark.parametrize('rule, column', [
+    (CleaningRule('Age', 'range', low=21, high=50), 'Age'),
+    (CleaningRule('Pregnancies', 'range', low=0, high=10), 'Pregnancies'),
+])
+def test_rules_apply_to_integer_columns_without_integer_rule(rule, column):
+    raw = pd.read_csv(RAW_PATH)
+    report = CleaningReport()
+    cleaned = clean_chunk(raw.copy(), report, compile_rules([rule]))
+
+    removed = cleaned[column].isnull()
+    assert report.hits[rule.name] > 0
+    assert removed.sum() == report.hits[rule.name]
+    assert str(cleaned[column].dtype) == 'Int64'
+    kept = raw[column][~removed]
+    assert (cleaned[column][~removed] == kept).all()
+    assert kept.between(rule.low, rule.high).all()
@@ -0,0 +1,31 @@
+import os
+import shutil
+
+import dataset_cache
+from conftest import CLEANED_PATH
+from dataset_cache import file_fingerprint, fingerprint_matches
+
+
+def test_touched_file_is_hashed_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'data.csv')
+    shutil.copyfile(CLEANED_PATH, path)
+    stored = file_fingerprint(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    hashes = []
+    real_hash = dataset_cache.hash_file
+    monkeypatch.setattr(dataset_cache, 'hash_file',
+                        lambda p: hashes.append(p) or real_hash(p))
+    assert fingerprint_matches(stored, path)
+    assert fingerprint_matches(stored, path)
+    assert len(hashes) == 1
+
+
+def test_changed_contents_do_not_match(tmp_path):
+    path = tmp_path / 'data.csv'
+    shutil.copyfile(CLEANED_PATH, path)
+    stored = file_fingerprint(str(path))
+    data = path.read_bytes()
+    path.write_bytes(data.replace(b'148.0', b'149.0', 1))
+    assert not fingerprint_matches(stored, str(path))
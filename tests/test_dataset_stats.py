@@ -0,0 +1,65 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH
+from dataset_stats import StatsAccumulator
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(CLEANED_PATH)
+
+
+def accumulate(frame):
+    stats = StatsAccumulator()
+    stats.update(frame)
+    return stats
+
+
+def parts(df, sizes):
+    bounds = np.cumsum([0] + sizes)
+    return [df.iloc[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def assert_same_statistics(merged, single):
+    assert merged.rows == single.rows
+    np.testing.assert_array_equal(merged.missing, single.missing)
+    np.testing.assert_array_equal(merged.count, single.count)
+    np.testing.assert_array_equal(merged.min, single.min)
+    np.testing.assert_array_equal(merged.max, single.max)
+    pd.testing.assert_frame_equal(merged.summary(), single.summary(),
+                                  rtol=1e-12)
+    assert merged.data_quality() == single.data_quality()
+    assert sorted(merged.by_class) == sorted(single.by_class)
+    for key in single.by_class:
+        pd.testing.assert_frame_equal(merged.by_class[key].summary(),
+                                      single.by_class[key].summary(),
+                                      rtol=1e-12)
+
+
+@pytest.mark.parametrize('sizes', [[768], [384, 384], [1, 500, 267],
+                                   [100] * 7 + [68]])
+def test_merged_partials_match_single_pass(df, sizes):
+    merged = reduce(StatsAccumulator.merge,
+                    [accumulate(part) for part in parts(df, sizes)],
+                    StatsAccumulator())
+    assert_same_statistics(merged, accumulate(df))
+
+
+def test_merge_grouping_does_not_matter(df):
+    a, b, c = [accumulate(part) for part in parts(df, [200, 300, 268])]
+    left = StatsAccumulator().merge(a).merge(b).merge(c)
+    a, b, c = [accumulate(part) for part in parts(df, [200, 300, 268])]
+    right = StatsAccumulator().merge(a).merge(b.merge(c))
+    assert_same_statistics(left, right)
+
+
+def test_single_pass_matches_pandas(df):
+    stats = accumulate(df)
+    pd.testing.assert_series_equal(stats.missing_counts(), df.isnull().sum())
+    expected = (1 - df.isnull().sum().sum() / df.size) * 100
+    assert stats.data_quality() == round(expected, 1)
+    pd.testing.assert_frame_equal(stats.summary(), df.describe(), rtol=1e-12)
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH
+from data_cleaning import ZERO_AS_MISSING_COLUMNS
+from diabetes_dataset import DiabetesDataset
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    # A copy of the cleaned data, so sidecar caches land in tmp_path
+    path = tmp_path / 'diabetes.csv'
+    path.write_bytes(open(CLEANED_PATH, 'rb').read())
+    return str(path)
+
+
+@pytest.mark.parametrize('ending', [b'', b'\n', b'\n\n', b'\r\n\r\n  \n'])
+def test_lazy_record_count_matches_loaded(tmp_path, ending):
+    with open(CLEANED_PATH, 'rb') as f:
+        data = f.read().rstrip(b'\n') + ending
+    path = tmp_path / 'data.csv'
+    path.write_bytes(data)
+
+    lazy = DiabetesDataset(str(path), lazy=True)
+    assert lazy.get_record_count() == len(pd.read_csv(path))
+    assert lazy.get_record_count() == len(DiabetesDataset(str(path)).df)
+
+
+def write_shards(directory, rows=30_000, shards=3, seed=0):
+    # Resampled cleaned rows with jitter, split into CSV shards
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(CLEANED_PATH)
+    df = sample.iloc[rng.integers(len(sample), size=rows)].reset_index(drop=True)
+    df['Glucose'] = (df['Glucose'] + rng.normal(0, 3, size=rows)).round(3)
+    bounds = np.linspace(0, rows, shards + 1).astype(int)
+    for i in range(shards):
+        df.iloc[bounds[i]:bounds[i + 1]].to_csv(
+            directory / f'part-{i}.csv', index=False)
+    return df
+
+
+def test_summary_is_exact_once_sharded_data_is_loaded(tmp_path):
+    df = write_shards(tmp_path)
+    dataset = DiabetesDataset(str(tmp_path), lazy=True)
+    dataset.get_summary()       # sketch estimate while not loaded
+    dataset.df
+    summary = dataset.get_summary()
+    assert summary.loc['50%', 'Glucose'] == df['Glucose'].median()
+
+
+def test_streaming_bitmap_keeps_only_the_histogram(sample_csv):
+    df = pd.read_csv(sample_csv)
+    streaming = DiabetesDataset(sample_csv, streaming=True, chunksize=100)
+    loaded = DiabetesDataset(sample_csv)
+
+    complete = int(df[ZERO_AS_MISSING_COLUMNS].notnull().all(axis=1).sum())
+    assert streaming.get_complete_count() == complete
+    assert loaded.get_complete_count() == complete
+    pd.testing.assert_frame_equal(streaming.get_missing_patterns(),
+                                  loaded.get_missing_patterns())
+    assert len(streaming._bitmap) == len(df)
+    assert len(streaming._bitmap.bits) == 0
+    with pytest.raises(ValueError):
+        streaming.get_complete_cases()
+
+    for dataset in (streaming, loaded):
+        pd.testing.assert_series_equal(dataset.get_missing_counts(),
+                                       df.isnull().sum())
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'lazy': True}, {'streaming': True, 'chunksize': 100},
+    {'compact': True},
+], ids=['loaded', 'lazy', 'streaming', 'compact'])
+def test_append_matches_full_recompute(sample_csv, options):
+    df = pd.read_csv(sample_csv)
+    first = df.iloc[:5].to_dict(orient='records')
+    second = df.iloc[100:140].copy()
+    second.loc[second.index[:3], ['Glucose', 'Insulin']] = np.nan
+
+    dataset = DiabetesDataset(sample_csv, **options)
+    dataset.get_summary()               # memoized before the appends
+    dataset.append(first[0])
+    dataset.append(first[1:])
+    dataset.append(second)
+
+    combined = pd.concat([df, pd.DataFrame(first), second], ignore_index=True)
+    # Compact BMI and pedigree are float32
+    rtol = 1e-6 if options.get('compact') else 1e-12
+    pd.testing.assert_frame_equal(dataset.get_summary(), combined.describe(),
+                                  rtol=rtol)
+    assert dataset.get_record_count() == len(combined)
+    pd.testing.assert_series_equal(dataset.get_missing_counts(),
+                                   combined.isnull().sum())
+    expected = (1 - combined.isnull().sum().sum() / combined.size) * 100
+    assert dataset.get_data_quality() == round(expected, 1)
+
+
+@pytest.mark.parametrize('columns, filter', [
+    (None, None),
+    (['Glucose', 'BMI', 'Outcome'], None),
+    (None, 'Age >= 50 and Glucose > 120'),
+    (['Glucose', 'Insulin'], 'Outcome == 1 and BMI < 35'),
+])
+def test_projection_and_filter_agree_across_load_paths(sample_csv, columns,
+                                                       filter):
+    def load(**options):
+        return DiabetesDataset(sample_csv, columns=columns, filter=filter,
+                               **options)
+
+    csv = load(use_cache=False).df
+    DiabetesDataset(sample_csv)         # a full load writes the sidecar
+    cached = load()
+    assert cached.cache_hit
+    arrow = load(use_cache=False, engine='pyarrow').df
+    streaming = pd.concat(load(streaming=True, chunksize=100).iter_chunks(),
+                          ignore_index=True)
+
+    expected = pd.read_csv(sample_csv)
+    if filter is not None:
+        expected = expected.query(filter.replace(' and ', ' & '))
+    expected = expected[columns or expected.columns].reset_index(drop=True)
+    pd.testing.assert_frame_equal(csv.reset_index(drop=True), expected,
+                                  check_dtype=False)
+    for frame in (cached.df, arrow, streaming):
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True),
+                                      csv.reset_index(drop=True))
+
+
+def expected_rows(df, filter):
+    if filter is None:
+        return df
+    return df.query(filter.replace(' and ', ' & ')).reset_index(drop=True)
+
+
+def quality(df):
+    return round((1 - df.isnull().sum().sum() / df.size) * 100, 1)
+
+
+@pytest.mark.parametrize('filter', [None, 'Glucose > 120 and Age < 40'])
+def test_shard_provenance_row_ranges(tmp_path, filter):
+    write_shards(tmp_path, rows=3_000)
+    shard_rows = [len(expected_rows(pd.read_csv(path), filter))
+                  for path in sorted(tmp_path.glob('*.csv'))]
+    stops = np.cumsum(shard_rows)
+
+    lazy = DiabetesDataset(str(tmp_path), lazy=True, workers=2, filter=filter)
+    streaming = DiabetesDataset(str(tmp_path), streaming=True, workers=2,
+                                filter=filter)
+    loaded = DiabetesDataset(str(tmp_path), workers=2, filter=filter)
+    for dataset in (lazy, streaming, loaded):
+        provenance = dataset.get_shard_provenance()
+        assert provenance['shard'].tolist() == sorted(
+            str(path) for path in tmp_path.glob('*.csv'))
+        assert provenance['rows'].tolist() == shard_rows
+        assert provenance['start'].tolist() == [0, *stops[:-1]]
+        assert provenance['stop'].tolist() == stops.tolist()
+
+    # The ranges index the combined frame
+    frame = loaded.df
+    for _, shard in provenance.iterrows():
+        part = expected_rows(pd.read_csv(shard['shard']), filter)
+        pd.testing.assert_frame_equal(
+            frame.iloc[shard['start']:shard['stop']].reset_index(drop=True),
+            part, check_dtype=False)
+
+
+@pytest.mark.parametrize('filter', [None, 'Glucose > 120 and Age < 40'])
+def test_sharded_counts_match_merged_and_loaded(tmp_path, filter):
+    df = expected_rows(write_shards(tmp_path, rows=3_000), filter)
+
+    lazy = DiabetesDataset(str(tmp_path), lazy=True, workers=2, filter=filter)
+    streaming = DiabetesDataset(str(tmp_path), streaming=True, workers=2,
+                                filter=filter)
+    for dataset in (lazy, streaming):
+        # Merged per-shard statistics
+        assert dataset.get_record_count() == len(df)
+        assert dataset.get_data_quality() == quality(df)
+
+    lazy.df
+    assert lazy.get_record_count() == len(df)
+    assert lazy.get_data_quality() == quality(df)
+    assert len(lazy.df) == len(df)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH
+from diabetes_dataset import COMPACT_DTYPES, DiabetesDataset
+from imputation import IMPUTE_COLUMNS, KNN_FEATURES, KNNImputer
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    path = tmp_path / 'diabetes.csv'
+    path.write_bytes(open(CLEANED_PATH, 'rb').read())
+    return str(path)
+
+
+def test_median_imputation_uses_each_outcome_median(sample_csv):
+    df = pd.read_csv(sample_csv)
+    imputed = DiabetesDataset(sample_csv).impute('median')
+
+    for column in IMPUTE_COLUMNS:
+        missing = df[column].isnull()
+        assert missing.any()
+        pd.testing.assert_series_equal(imputed[column][~missing],
+                                       df[column][~missing])
+        for outcome, rows in df.groupby('Outcome'):
+            filled = imputed.loc[rows.index[rows[column].isnull()], column]
+            assert (filled == rows[column].median()).all()
+
+
+@pytest.mark.parametrize('method', ['median', 'knn'])
+def test_imputed_chunks_have_no_missing_values(sample_csv, method):
+    loaded = DiabetesDataset(sample_csv).impute(method)
+    streaming = DiabetesDataset(sample_csv, streaming=True, chunksize=100)
+    chunks = list(streaming.iter_imputed_chunks(method))
+
+    assert len(chunks) > 1
+    imputed = pd.concat(chunks, ignore_index=True)
+    assert not imputed[IMPUTE_COLUMNS].isnull().any().any()
+    # Below the sketch size the streamed medians are exact, and KNN sees
+    # the same donors, so both match the in-memory result
+    pd.testing.assert_frame_equal(imputed, loaded)
+
+
+@pytest.mark.parametrize('method', ['median', 'knn'])
+def test_compact_integer_dtypes_survive_imputation(sample_csv, method):
+    dataset = DiabetesDataset(sample_csv, compact=True)
+    imputed = dataset.impute(method)
+
+    for column in IMPUTE_COLUMNS:
+        assert str(imputed[column].dtype) == COMPACT_DTYPES[column]
+        assert not imputed[column].isnull().any()
+    # The dataset itself keeps its missing values
+    assert dataset.df[IMPUTE_COLUMNS].isnull().any().all()
+
+
+def test_knn_matches_brute_force_neighbours():
+    df = pd.read_csv(CLEANED_PATH)
+    imputer = KNNImputer(k=5, columns=['Insulin']).fit([df])
+    imputed = imputer.transform(df)
+
+    donors = df.dropna(subset=KNN_FEATURES + ['Insulin'])
+    features = donors[KNN_FEATURES].to_numpy()
+    centre, scale = features.mean(axis=0), features.std(axis=0)
+    scaled = (features - centre) / scale
+    targets = donors['Insulin'].to_numpy()
+
+    rows = df[df['Insulin'].isnull()].dropna(subset=KNN_FEATURES)
+    for index, row in rows.head(25).iterrows():
+        query = (row[KNN_FEATURES].to_numpy(dtype='float64') - centre) / scale
+        nearest = np.argsort(((scaled - query) ** 2).sum(axis=1),
+                             kind='stable')[:5]
+        assert imputed.loc[index, 'Insulin'] == pytest.approx(
+            targets[nearest].mean())
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from quantile_sketch import KLLSketch
+
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+def test_exact_until_first_compaction():
+    values = np.random.default_rng(1).normal(size=150)
+    sketch = KLLSketch(k=200)
+    sketch.update(values)
+    assert sketch.is_exact
+    assert sketch.rank_error() == 0.0
+    np.testing.assert_array_equal(sketch.quantile(QUANTILES),
+                                  np.quantile(values, QUANTILES))
+
+
+def rank_errors(sketch, values):
+    # How far each estimated quantile's true rank is from the requested one
+    ordered = np.sort(values)
+    estimates = sketch.quantile(QUANTILES)
+    ranks = np.searchsorted(ordered, estimates, side='right') / len(ordered)
+    return np.abs(ranks - QUANTILES)
+
+
+@pytest.mark.parametrize('k', [200, 1000])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_rank_error_within_bound(k, seed):
+    values = np.random.default_rng(seed).lognormal(size=200_000)
+    sketch = KLLSketch(k=k, rng=np.random.default_rng(seed))
+    for chunk in np.array_split(values, 40):
+        sketch.update(chunk)
+    assert not sketch.is_exact
+    assert rank_errors(sketch, values).max() <= sketch.rank_error()
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_merged_rank_error_within_bound(seed):
+    rng = np.random.default_rng(seed)
+    shards = [rng.normal(loc, size=50_000) for loc in (0, 3, -2, 10)]
+    sketches = []
+    for shard in shards:
+        sketch = KLLSketch(k=200, rng=np.random.default_rng(seed))
+        sketch.update(shard)
+        sketches.append(sketch)
+    merged = KLLSketch(k=200)
+    for sketch in sketches:
+        merged.merge(sketch)
+
+    assert merged.n == 200_000
+    assert (rank_errors(merged, np.concatenate(shards)).max()
+            <= merged.rank_error())
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH, ROOT
+from reference_index import INDEX_PATH, ReferenceIndex
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ReferenceIndex.load(os.path.join(ROOT, INDEX_PATH))
+
+
+@pytest.fixture(scope='module')
+def cohort():
+    df = pd.read_csv(CLEANED_PATH)
+    # Values off both ends of the reference, and a missing age
+    extra = df.head(3).copy()
+    extra['Glucose'] = [0, 500, np.nan]
+    extra['Age'] = [10, 120, np.nan]
+    return pd.concat([df, extra], ignore_index=True)
+
+
+@pytest.mark.parametrize('group', ['healthy', 'diabetic', 'all'])
+@pytest.mark.parametrize('stratify_by', [None, 'age', 'pregnancies'])
+def test_batch_ranks_match_single_ranks(index, cohort, group, stratify_by):
+    ranks = index.percentile_ranks(cohort, group, stratify_by)
+    for i, row in cohort.iterrows():
+        single = index.score(row.to_dict(), group, stratify_by)
+        expected = [single[feature] for feature in ranks.columns]
+        np.testing.assert_array_equal(ranks.loc[i].to_numpy(), expected)
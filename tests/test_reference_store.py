@@ -0,0 +1,48 @@
+import os
+
+from conftest import ROOT
+from reference_index import INDEX_PATH
+from reference_store import (ReferenceStore, list_versions, publish_snapshot,
+                             read_current_version, snapshot_path)
+
+
+def index_files(tmp_path, count):
+    # Files with different contents, so different digests
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'index-{i}.arrow'
+        path.write_bytes(f'index {i}'.encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_versions_published_in_one_second_sort_by_age(tmp_path):
+    directory = str(tmp_path / 'snapshots')
+    a, b, c = index_files(tmp_path, 3)
+    published = [publish_snapshot(path, directory, keep=10)
+                 for path in (a, b, c, a)]
+
+    assert len(set(published)) == 4
+    assert list_versions(directory) == published
+    assert read_current_version(directory) == published[-1]
+
+
+def test_keep_prunes_the_oldest_snapshots(tmp_path):
+    directory = str(tmp_path / 'snapshots')
+    paths = index_files(tmp_path, 5)
+    published = [publish_snapshot(path, directory, keep=2) for path in paths]
+
+    assert list_versions(directory) == published[-3:]
+    for version in published[:2]:
+        assert not os.path.exists(snapshot_path(version, directory))
+
+
+def test_republishing_the_live_index_is_a_no_op(tmp_path):
+    directory = str(tmp_path / 'snapshots')
+    index = os.path.join(ROOT, INDEX_PATH)
+    version = publish_snapshot(index, directory)
+    assert publish_snapshot(index, directory) == version
+    assert list_versions(directory) == [version]
+
+    store = ReferenceStore(directory, check_interval=0, fallback_path=None)
+    assert store.current().version == version
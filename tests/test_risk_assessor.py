@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLEANED_PATH
+from health_profile import FEATURE_COLUMNS, HealthProfile
+from risk_assessor import RiskAssessor, profiles_to_columns
+
+
+@pytest.fixture(scope='module')
+def assessor():
+    return RiskAssessor()
+
+
+def test_nan_optional_measurement_is_missing(assessor):
+    profile = HealthProfile(glucose=140, blood_pressure=88, bmi=34.5, age=45,
+                            insulin=math.nan)
+    single = assessor.assess(profile)
+    batch = assessor.assess_batch(profiles_to_columns([profile]))
+    assert 'Insulin' not in single.features
+    assert single.score == batch.score[0]
+    assert single.code == batch.overall[0]
+
+
+def test_nan_required_measurement_is_invalid(assessor):
+    profile = HealthProfile(glucose=math.nan, blood_pressure=88, bmi=34.5,
+                            age=45)
+    with pytest.raises(ValueError):
+        assessor.assess(profile)
+    assert not assessor.assess_batch(profiles_to_columns([profile])).valid[0]
+
+
+@pytest.fixture(scope='module')
+def sample_profiles():
+    df = pd.read_csv(CLEANED_PATH).dropna(
+        subset=['Glucose', 'BloodPressure', 'BMI', 'Age'])
+    return [HealthProfile.from_dict({field: row[column]
+                                     for field, column in FEATURE_COLUMNS.items()
+                                     if not np.isnan(row[column])})
+            for _, row in df.iterrows()]
+
+
+@pytest.mark.parametrize('stratify_by', [None, 'age', 'pregnancies'])
+def test_batch_matches_single_profiles(assessor, sample_profiles, stratify_by):
+    batch = assessor.assess_batch(profiles_to_columns(sample_profiles),
+                                  stratify_by=stratify_by)
+    assert batch.valid.all()
+    for i, profile in enumerate(sample_profiles):
+        single = assessor.assess(profile, stratify_by=stratify_by)
+        percentiles = [single.features[feature].percentile
+                       if feature in single.features else np.nan
+                       for feature in batch.features]
+        np.testing.assert_array_equal(percentiles, batch.percentiles[i])
+        assert single.score == batch.score[i]
+        assert single.code == batch.overall[i]
+
+
+def test_age_stratum_ranks_against_own_age_band(assessor):
+    profile = HealthProfile(glucose=140, blood_pressure=88, bmi=34.5, age=65)
+    single = assessor.assess(profile, stratify_by='age')
+    older = assessor.index.reference_values('Glucose', 'healthy',
+                                            ('age', '60+'))
+    expected = (older <= 140).mean() * 100
+    assert single.features['Glucose'].percentile == pytest.approx(expected)
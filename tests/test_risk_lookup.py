@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import ROOT
+from reference_index import INDEX_PATH, ReferenceIndex
+from risk_lookup import RiskLookupTable, build_lookup
+
+
+INDEX = os.path.join(ROOT, INDEX_PATH)
+
+
+def test_load_accepts_table_built_from_index(tmp_path):
+    path = str(tmp_path / 'lookup.arrow')
+    table = build_lookup(INDEX, path)
+
+    loaded = RiskLookupTable.load(path, INDEX)
+    assert loaded.source_digest == table.source_digest
+    assert (loaded.packed == table.packed).all()
+
+
+def test_load_rejects_table_from_another_index(tmp_path):
+    path = str(tmp_path / 'lookup.arrow')
+    build_lookup(INDEX, path)
+
+    # A rebuilt index with different contents
+    index = ReferenceIndex.load(INDEX)
+    other = str(tmp_path / 'other.arrow')
+    values = index.values.copy()
+    values[-1] += 1
+    ReferenceIndex(values, index.offsets, index.tables, index.features,
+                   index.summary).save(other)
+
+    with pytest.raises(ValueError, match='not built from'):
+        RiskLookupTable.load(path, other)
+    assert not RiskLookupTable.load(path, index_path=None).built_from(other)
+
+
+def test_snapshot_copy_has_same_source(tmp_path):
+    path = str(tmp_path / 'lookup.arrow')
+    build_lookup(INDEX, path)
+    snapshot = str(tmp_path / 'snapshot.arrow')
+    shutil.copyfile(INDEX, snapshot)
+
+    assert RiskLookupTable.load(path, index_path=None).built_from(snapshot)